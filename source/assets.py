@@ -0,0 +1,211 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Baked assets: sprite sheets and sliced, scaled frames stored as raw pixels, so
+# loading them is a plain copy instead of a PNG decode and a slice and resample.
+# Level backgrounds are not baked, tools.ScaledBackground scales a strip of the
+# source image faster than it could read the 7 times larger scaled strip.
+#
+# Bake the assets with
+#
+#     python -m source.assets
+#
+# The cache lives in a directory named after a hash of the source graphics and
+# json data, editing any of them makes the game ignore the old bake.
+
+import os
+import json
+import hashlib
+import pygame as pg
+
+# Bump when the layout of the baked files changes
+CACHE_VERSION = 1
+
+# Function to hash the contents of all files under the given directories
+def get_digest(sources):
+    digest = hashlib.sha1(str(CACHE_VERSION).encode())
+    for source in sources:
+        for root, dirs, files in sorted(os.walk(source)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, source).replace(os.sep, '/').encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+# Class loading baked assets, every load returns None when the asset was not baked
+class AssetCache():
+    def __init__(self, directory, sources):
+        self.directory = directory
+        self.sources = sources
+        self.digest = get_digest(sources)
+        self.path = os.path.join(directory, self.digest)
+        self.index = self.load_index()
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.path, 'index.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_baked(self):
+        return self.index is not None
+
+    def read(self, name):
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+    def load_sheet(self, name):
+        if self.index is None or name not in self.index['sheets']:
+            return None
+        info = self.index['sheets'][name]
+        return to_surface(self.read(info['file']), info['size'], info['alpha'], info['colorkey'])
+
+    def load_frames(self, frame_cache, graphics):
+        # Put all baked frames of the sheets in graphics into frame_cache
+        if self.index is None:
+            return 0
+        data = self.read('frames.raw')
+        count = 0
+        for info in self.index['frames']:
+            sheet = graphics.get(info['sheet'])
+            if sheet is None:
+                continue
+            size = info['size']
+            image = to_surface(data[info['offset']:info['offset'] + size[0] * size[1] * 3],
+                               size, False, info['colorkey'])
+            colorkey = tuple(info['colorkey']) if info['colorkey'] is not None else None
+            key = (sheet, tuple(info['rect']), colorkey, info['scale'], tuple(info['flip']))
+            frame_cache.add_image(key, image)
+            count += 1
+        return count
+
+    def bake(self, graphics, frame_cache):
+        # Write graphics and the frames in frame_cache to a new cache
+        os.makedirs(self.path, exist_ok=True)
+        names = {sheet: name for name, sheet in graphics.items()}
+        index = {'version': CACHE_VERSION, 'sheets': {}, 'frames': []}
+
+        for name, sheet in graphics.items():
+            alpha = bool(sheet.get_flags() & pg.SRCALPHA)
+            colorkey = sheet.get_colorkey()
+            index['sheets'][name] = {
+                'file': name + '.raw',
+                'size': sheet.get_size(),
+                'alpha': alpha,
+                'colorkey': colorkey[:3] if colorkey is not None else None
+            }
+            self.write(name + '.raw', [to_bytes(sheet, alpha)])
+
+        chunks = []
+        offset = 0
+        for (sheet, rect, colorkey, scale, flip), image in frame_cache.get_items():
+            if sheet not in names or 0 in image.get_size():
+                continue
+            index['frames'].append({
+                'sheet': names[sheet],
+                'rect': rect,
+                'colorkey': colorkey,
+                'scale': scale,
+                'flip': flip,
+                'size': image.get_size(),
+                'offset': offset
+            })
+            chunks.append(to_bytes(image, False))
+            offset += len(chunks[-1])
+        self.write('frames.raw', chunks)
+
+        # the index goes last, a bake that fails half way is never loaded
+        self.write('index.json', [json.dumps(index).encode()])
+        self.index = index
+
+    def write(self, name, chunks):
+        with open(os.path.join(self.path, name), 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def remove_stale(self):
+        # Delete bakes of older versions of the sources
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != self.digest and os.path.isdir(path):
+                for file_name in os.listdir(path):
+                    os.remove(os.path.join(path, file_name))
+                os.rmdir(path)
+
+# Function to get the raw pixels of a surface
+def to_bytes(surface, alpha):
+    return pg.image.tobytes(surface, 'RGBA' if alpha else 'RGB')
+
+# Function to create a display format surface from raw pixels
+def to_surface(data, size, alpha, colorkey):
+    if alpha:
+        return pg.image.frombytes(data, size, 'RGBA').convert_alpha()
+    image = pg.image.frombytes(data, size, 'RGB').convert()
+    if colorkey is not None:
+        image.set_colorkey(colorkey)
+    return image
+
+# Function to bake the assets of every level and player
+def bake():
+    from . import headless
+    from . import setup, tools
+    from . import constants as c
+    from .components import brick, coin, enemy, powerup, stuff
+    from .states import main_menu
+
+    # Creating the states and sprites puts all the frames they use in the frame cache
+    main_menu.Menu()
+    for level_num in range(1, 5):
+        for player_name in (c.PLAYER_MARIO, c.PLAYER_LUIGI):
+            headless.Simulation(level_num, player_name)
+
+    # and the sprites a level only creates while it is played
+    powerup.FireBall(0, 0, True)
+    powerup.FireBall(0, 0, False)
+    powerup.Mushroom(0, 0)
+    powerup.LifeMushroom(0, 0)
+    powerup.FireFlower(0, 0)
+    powerup.Star(0, 0)
+    coin.Coin(0, 0, pg.sprite.Group())
+    coin.FlashCoin(0, 0)
+    brick.BrickPiece(0, 0, 0, 0)
+    stuff.CastleFlag(0, 0)
+    stuff.Score(0, 0, 100)
+    enemy.Fire(0, 0, c.LEFT)
+
+    setup.ASSET_CACHE.remove_stale()
+    setup.ASSET_CACHE.bake(setup.GFX, tools.FRAME_CACHE)
+    return setup.ASSET_CACHE
+
+if __name__ == '__main__':
+    # Bake without opening a window
+    os.environ.setdefault('MARIO_HEADLESS', '1')
+    cache = bake()
+    print('baked assets to', cache.path)
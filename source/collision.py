@@ -0,0 +1,76 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Batched collision queries against the static colliders of a level (ground,
+# steps, pipes, bricks, boxes and sliders in level.solid_group). A snapshot
+# copies the colliders around an area into x/y/w/h arrays in group order, then
+# answers which collider each rect of a whole batch hits first, as indices into
+# snapshot.sprites, the same as calling group.spritecollideany per rect.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Function to get the index of the first collider each rect collides with,
+# -1 for none, colliders being (x, y, w, h) arrays in group order
+def get_first_hits(x, y, w, h, colliders, mask=None):
+    cx, cy, cw, ch = colliders
+    if len(cx) == 0:
+        return np.full(len(x), -1)
+    hits = ((x[:, None] < cx + cw) & (x[:, None] + w[:, None] > cx) &
+            (y[:, None] < cy + ch) & (y[:, None] + h[:, None] > cy))
+    if mask is not None:
+        hits &= mask
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), -1)
+
+# Class for the colliders of a group around an area
+class ColliderSnapshot():
+    def __init__(self, group, area):
+        self.area = area
+        self.sprites = group.sprites_in_rect(area)
+        self.x, self.y, self.w, self.h = (
+            np.array([getattr(sprite.rect, name) for sprite in self.sprites], dtype=float)
+            for name in ('x', 'y', 'w', 'h'))
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def covers(self, rect):
+        return self.area.contains(rect)
+
+    def get_mask(self, predicate):
+        '''bool array of predicate(sprite) for the colliders'''
+        return np.array([bool(predicate(sprite)) for sprite in self.sprites], dtype=bool)
+
+    def get_first_hits(self, x, y, w, h, mask=None):
+        '''index of the first collider hit by each rect, -1 for none; only
+        rects within the snapshot area are answered correctly'''
+        return get_first_hits(x, y, w, h, (self.x, self.y, self.w, self.h), mask)
+
+    def get_sprites(self, hits):
+        '''the collider sprites of get_first_hits() results, None for no hit'''
+        return [self.sprites[i] if i >= 0 else None for i in hits]
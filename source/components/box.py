@@ -61,7 +61,7 @@ class Box(pg.sprite.Sprite):
             (416, 0, 16, 16), (400, 0, 16, 16), (432, 0, 16, 16)]
         # Extract frames from the tile sheet and store them in self.frames
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect, 
+            self.frames.append(tools.get_frame(sheet, *frame_rect, 
                             c.BLACK, c.BRICK_SIZE_MULTIPLIER))
     
     # Update the box's animation and state based on the game information
@@ -55,7 +55,7 @@ class Coin(pg.sprite.Sprite):
                         (20, 113, 8, 14), (36, 113, 8, 14)]
         # Extract frames from the item sheet and store them in self.frames
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect, 
+            self.frames.append(tools.get_frame(sheet, *frame_rect, 
                             c.BLACK, c.BRICK_SIZE_MULTIPLIER))
     
     # Update the coin's spinning animation based on the game information
@@ -103,7 +103,7 @@ class FlashCoin(pg.sprite.Sprite):
                         (17, 160, 5, 8), (9, 160, 5, 8)]
         # Extract frames from the item sheet and store them in self.frames
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect, 
+            self.frames.append(tools.get_frame(sheet, *frame_rect, 
                             c.BLACK, c.BRICK_SIZE_MULTIPLIER))
 
     # Update the flashing coin's animation based on the current time
@@ -141,7 +141,7 @@ class StaticCoin(pg.sprite.Sprite):
                         (35, 98, 9, 13), (51, 98, 9, 13)]
         # Extract frames from the item sheet and store them in self.frames
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect, 
+            self.frames.append(tools.get_frame(sheet, *frame_rect, 
                             c.BLACK, c.BRICK_SIZE_MULTIPLIER))
 
     # Update the static coin's animation based on the game information
@@ -104,7 +104,7 @@ class Enemy(pg.sprite.Sprite):
     # Loading sprite frames from a sprite sheet
     def load_frames(self, sheet, frame_rect_list):
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect, 
+            self.frames.append(tools.get_frame(sheet, *frame_rect, 
                             c.BLACK, c.SIZE_MULTIPLIER))
 
     # Setting the initial velocity of the enemy
@@ -227,7 +227,7 @@ class Enemy(pg.sprite.Sprite):
                 self.rect.right = self.range_end
                 self.change_direction(c.LEFT)
         else:
-            collider = pg.sprite.spritecollideany(self, level.ground_step_pipe_group)
+            collider = level.ground_step_pipe_group.spritecollideany(self)
             if collider:
                 if self.direction == c.RIGHT:
                     self.rect.right = collider.rect.left
@@ -259,11 +259,9 @@ class Enemy(pg.sprite.Sprite):
     def check_y_collisions(self, level):
         # decrease runtime delay: when enemy is on the ground, don't check brick and box
         if self.rect.bottom >= c.GROUND_HEIGHT:
-            sprite_group = level.ground_step_pipe_group
+            sprite = level.ground_step_pipe_group.spritecollideany(self)
         else:
-            sprite_group = pg.sprite.Group(level.ground_step_pipe_group,
-                            level.brick_group, level.box_group)
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+            sprite = level.solid_group.spritecollideany(self)
         if sprite and sprite.name != c.MAP_SLIDER:
             if self.rect.top <= sprite.rect.top:
                 self.rect.bottom = sprite.rect.y
@@ -280,10 +278,10 @@ class Goomba(Enemy):
         self.setup_enemy(x, y, direction, name, setup.GFX[c.ENEMY_SHEET],
                     frame_rect_list, in_range, range_start, range_end)
         # dead jump image
-        self.frames.append(pg.transform.flip(self.frames[2], False, True))
+        self.frames.append(tools.flip_frame(self.frames[2], False, True))
         # right walk images
-        self.frames.append(pg.transform.flip(self.frames[0], True, False))
-        self.frames.append(pg.transform.flip(self.frames[1], True, False))
+        self.frames.append(tools.flip_frame(self.frames[0], True, False))
+        self.frames.append(tools.flip_frame(self.frames[1], True, False))
 
     # Getting the frame rectangles for the Goomba based on its color
     def get_frame_rect(self, color):
@@ -313,10 +311,10 @@ class Koopa(Enemy):
         self.setup_enemy(x, y, direction, name, setup.GFX[c.ENEMY_SHEET],
                     frame_rect_list, in_range, range_start, range_end)
         # dead jump image
-        self.frames.append(pg.transform.flip(self.frames[2], False, True))
+        self.frames.append(tools.flip_frame(self.frames[2], False, True))
         # right walk images
-        self.frames.append(pg.transform.flip(self.frames[0], True, False))
-        self.frames.append(pg.transform.flip(self.frames[1], True, False))
+        self.frames.append(tools.flip_frame(self.frames[0], True, False))
+        self.frames.append(tools.flip_frame(self.frames[1], True, False))
 
     # Getting the frame rectangles for the Koopa based on its color
     def get_frame_rect(self, color):
@@ -351,10 +349,10 @@ class FlyKoopa(Enemy):
         self.setup_enemy(x, y, direction, name, setup.GFX[c.ENEMY_SHEET], 
                     frame_rect_list, in_range, range_start, range_end, isVertical)
         # dead jump image
-        self.frames.append(pg.transform.flip(self.frames[2], False, True))
+        self.frames.append(tools.flip_frame(self.frames[2], False, True))
         # right walk images
-        self.frames.append(pg.transform.flip(self.frames[0], True, False))
-        self.frames.append(pg.transform.flip(self.frames[1], True, False))
+        self.frames.append(tools.flip_frame(self.frames[0], True, False))
+        self.frames.append(tools.flip_frame(self.frames[1], True, False))
         self.state = c.FLY
 
     # Getting the frame rectangles for the Flying Koopa based on its color
@@ -389,19 +387,21 @@ class FireKoopa(Enemy):
         self.setup_enemy(x, y, direction, name, setup.GFX[c.ENEMY_SHEET], 
                     frame_rect_list, in_range, range_start, range_end)
         # right walk images
-        self.frames.append(pg.transform.flip(self.frames[0], True, False))
-        self.frames.append(pg.transform.flip(self.frames[1], True, False))
-        self.frames.append(pg.transform.flip(self.frames[2], True, False))
-        self.frames.append(pg.transform.flip(self.frames[3], True, False))
+        self.frames.append(tools.flip_frame(self.frames[0], True, False))
+        self.frames.append(tools.flip_frame(self.frames[1], True, False))
+        self.frames.append(tools.flip_frame(self.frames[2], True, False))
+        self.frames.append(tools.flip_frame(self.frames[3], True, False))
         self.x_vel = 0
         self.gravity = 0.3
         self.level = level
         self.fire_timer = 0
         self.jump_timer = 0
+        # jumping and shooting depend on the player distance, never put it to sleep
+        self.always_active = True
 
     def load_frames(self, sheet, frame_rect_list):
         for frame_rect in frame_rect_list:
-            self.frames.append(tools.get_image(sheet, *frame_rect,
+            self.frames.append(tools.get_frame(sheet, *frame_rect,
                             c.BLACK, c.BRICK_SIZE_MULTIPLIER))
 
     def walking(self):
@@ -446,16 +446,16 @@ class Fire(Enemy):
         self.setup_enemy(x, y, direction, name, setup.GFX[c.ENEMY_SHEET], 
                     frame_rect_list, in_range, range_start, range_end)
         # right images
-        self.frames.append(pg.transform.flip(self.frames[0], True, False))
-        self.frames.append(pg.transform.flip(self.frames[1], True, False))
+        self.frames.append(tools.flip_frame(self.frames[0], True, False))
+        self.frames.append(tools.flip_frame(self.frames[1], True, False))
         self.state = c.FLY
         self.x_vel = 5 if self.direction == c.RIGHT else -5
+        # keep flying until it hits something, even off screen
+        self.always_active = True
 
     # Checking for collisions in the x-direction for the Fire projectile
     def check_x_collisions(self, level):
-        sprite_group = pg.sprite.Group(level.ground_step_pipe_group,
-                            level.brick_group, level.box_group)
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
         if sprite:
             self.kill()
 
@@ -513,7 +513,7 @@ class Piranha(Enemy):
     def check_player_is_on(self, level):
         result = False
         self.rect.y -= 5
-        sprite = pg.sprite.spritecollideany(self, level.ground_step_pipe_group)
+        sprite = level.ground_step_pipe_group.spritecollideany(self)
         if sprite:
             if sprite.name == c.MAP_SLIDER:
                 self.rect.y += 5
@@ -542,9 +542,9 @@ class FireStick(pg.sprite.Sprite):
 
     def load_images(self):
         sheet = setup.GFX[c.ENEMY_SHEET]
-        self.frames.append(tools.get_image(sheet, 390, 90, 8, 8, 
+        self.frames.append(tools.get_frame(sheet, 390, 90, 8, 8, 
                         c.BLACK, c.SIZE_MULTIPLIER))
-        self.frames.append(tools.get_image(sheet, 398, 90, 8, 8, 
+        self.frames.append(tools.get_frame(sheet, 398, 90, 8, 8, 
                         c.BLACK, c.SIZE_MULTIPLIER))
 
     def animation(self):
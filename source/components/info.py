@@ -72,7 +72,7 @@ class Info():
         character_string = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ -*'
         
         for character, image_rect in zip(character_string, image_rect_list):
-            self.image_dict[character] = tools.get_image(setup.GFX['text_images'], 
+            self.image_dict[character] = tools.get_frame(setup.GFX['text_images'], 
                                             *image_rect, (92, 148, 252), 2.9)
 
     def create_info_labels(self):
@@ -196,6 +196,19 @@ class Info():
                 self.time -= 1
                 self.update_text(self.clock_time_label, self.time, True)
     
+    def restore_labels(self, level_info):
+        # Set the texts to the numbers again after they were set back, e.g. by
+        # Level.restore(), update_text() only ever writes the digits a number has
+        self.update_text(self.score_text, str(level_info[c.SCORE]).zfill(len(self.score_text)))
+        self.update_text(self.coin_count_text,
+                         str(level_info[c.COIN_TOTAL]).zfill(len(self.coin_count_text) - 1))
+        if self.state == c.LEVEL:
+            # the clock drops a leading digit whenever the time gets one shorter
+            digits = str(self.time)
+            del self.clock_time_label[:]
+            self.create_label(self.clock_time_label, digits.zfill(len(str(c.GAME_TIME_OUT))), 645, 55)
+            del self.clock_time_label[:-len(digits)]
+
     def update_text(self, text, score, reset=False):
         if reset and len(text) > len(str(score)):
             text.remove(text[0])
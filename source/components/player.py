@@ -121,10 +121,12 @@ class Player(pg.sprite.Sprite):
         
         for name, frames in frames_list.items():
             for frame in frames:
-                image = tools.get_image(sheet, frame['x'], frame['y'], 
+                # copies, as the player changes the alpha of its frames
+                image = tools.get_frame(sheet, frame['x'], frame['y'],
                                     frame['width'], frame['height'],
                                     c.BLACK, c.SIZE_MULTIPLIER)
-                left_image = pg.transform.flip(image, True, False)
+                left_image = tools.flip_frame(image, True, False).copy()
+                image = image.copy()
 
                 if name == c.RIGHT_SMALL_NORMAL:
                     self.right_small_normal_frames.append(image)
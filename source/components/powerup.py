@@ -25,7 +25,7 @@ SOFTWARE.
 __author__ = 'm0rniac'
 
 import pygame as pg
-from .. import setup, tools
+from .. import setup
 from .. import constants as c
 from . import stuff
 
@@ -83,10 +83,7 @@ class Powerup(stuff.Stuff):
         Args:
             level (Level): The current level object.
         """
-        sprite_group = pg.sprite.Group(
-            level.ground_step_pipe_group, level.brick_group, level.box_group
-        )
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
         if sprite:
             if self.direction == c.RIGHT:
                 self.rect.right = sprite.rect.left - 1
@@ -105,11 +102,7 @@ class Powerup(stuff.Stuff):
         Args:
             level (Level): The current level object.
         """
-        sprite_group = pg.sprite.Group(
-            level.ground_step_pipe_group, level.brick_group, level.box_group
-        )
-
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
         if sprite:
             self.y_vel = 0
             self.rect.bottom = sprite.rect.top
@@ -311,11 +304,7 @@ class Star(Powerup):
         Args:
             level (Level): The current level object.
         """
-        sprite_group = pg.sprite.Group(
-            level.ground_step_pipe_group, level.brick_group, level.box_group
-        )
-
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
 
         if sprite:
             if self.rect.top > sprite.rect.top:
@@ -354,6 +343,8 @@ class FireBall(Powerup):
             c.SIZE_MULTIPLIER,
         )
         self.type = c.TYPE_FIREBALL
+        # keep flying until it hits something, even off screen
+        self.always_active = True
         self.y_vel = 10
         self.gravity = 0.9
         self.state = c.FLYING
@@ -401,10 +392,7 @@ class FireBall(Powerup):
         Args:
             level (Level): The current level object.
         """
-        sprite_group = pg.sprite.Group(
-            level.ground_step_pipe_group, level.brick_group, level.box_group
-        )
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
         if sprite:
             self.change_to_explode()
 
@@ -415,11 +403,7 @@ class FireBall(Powerup):
         Args:
             level (Level): The current level object.
         """
-        sprite_group = pg.sprite.Group(
-            level.ground_step_pipe_group, level.brick_group, level.box_group
-        )
-
-        sprite = pg.sprite.spritecollideany(self, sprite_group)
+        sprite = level.solid_group.spritecollideany(self)
         enemy = pg.sprite.spritecollideany(self, level.enemy_group)
         if sprite:
             if self.rect.top > sprite.rect.top:
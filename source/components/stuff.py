@@ -103,7 +103,7 @@ class Stuff(pg.sprite.Sprite):
         self.frames = []
         self.frame_index = 0
         for image_rect in image_rect_list:
-            self.frames.append(tools.get_image(sheet, *image_rect, c.BLACK, scale))
+            self.frames.append(tools.get_frame(sheet, *image_rect, c.BLACK, scale))
         self.image = self.frames[self.frame_index]
         self.rect = self.image.get_rect()
         self.rect.x = x
@@ -237,7 +237,7 @@ class Score():
                             (20, 168, 4, 8), (0, 0, 0, 0)]
         digit_string = '0123456789'
         for digit, image_rect in zip(digit_string, digit_rect_list):
-            self.image_dict[digit] = tools.get_image(setup.GFX[c.ITEM_SHEET], *image_rect, c.BLACK, c.BRICK_SIZE_MULTIPLIER)
+            self.image_dict[digit] = tools.get_frame(setup.GFX[c.ITEM_SHEET], *image_rect, c.BLACK, c.BRICK_SIZE_MULTIPLIER)
     
     def create_score_digit(self):
         """Create the digit sprites for the score."""
@@ -259,10 +259,10 @@ class Score():
         if (self.y - self.digit_list[0].rect.y) > self.distance:
             score_list.remove(self)
             
-    def draw(self, screen):
-        """Draw the score digits on the screen."""
+    def draw(self, screen, offset=(0, 0)):
+        """Draw the score digits on the screen, offset is the top left of the visible area."""
         for digit in self.digit_list:
-            screen.blit(digit.image, digit.rect)
+            screen.blit(digit.image, digit.rect.move(-offset[0], -offset[1]))
 
 class Pipe(Stuff):
     """
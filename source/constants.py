@@ -28,6 +28,9 @@ DEBUG = False
 DEBUG_START_X = 110
 DEBUG_START_y = 538
 
+# only update the changed parts of the screen while the camera is still
+DIRTY_RECT_MODE = False
+
 SCREEN_HEIGHT = 600
 SCREEN_WIDTH = 800
 SCREEN_SIZE = (SCREEN_WIDTH,SCREEN_HEIGHT)
@@ -60,9 +63,66 @@ SIZE_MULTIPLIER = 2.5
 BRICK_SIZE_MULTIPLIER = 2.69
 BACKGROUND_MULTIPLER = 2.679
 GROUND_HEIGHT = SCREEN_HEIGHT - 62
+# width of a brick, box or coin, 16 * BRICK_SIZE_MULTIPLIER
+TILE_SIZE = 43
 
 GAME_TIME_OUT = 301
 
+# cell size of the spatial index for level geometry, and how far (in pixels)
+# indexed sprites may move from where they were added, e.g. a bumped brick
+GRID_CELL_SIZE = 128
+GRID_MARGIN = 32
+
+# enemies and items further than this (in pixels) left or right of the
+# viewport are asleep and not updated
+ACTIVATION_MARGIN = 400
+
+# only create the ground, steps, pipes, coins, bricks, boxes and checkpoints of
+# the STREAM_CHUNK_WIDTH wide parts of the map within STREAM_DISTANCE pixels of
+# the viewport, and the enemies when their checkpoint is reached
+STREAMING = False
+STREAM_CHUNK_WIDTH = 1024
+STREAM_DISTANCE = 800
+
+# move walking and falling goombas and koopas with NumPy arrays when numpy is
+# installed and at least BATCH_MIN_ENEMIES of them are awake
+BATCH_ENEMIES = True
+BATCH_MIN_ENEMIES = 16
+
+# let the player rewind a level by holding the rewind key, which costs a
+# snapshot every frame, so it is off unless wanted. The last REWIND_SECONDS of
+# a level are kept in at most REWIND_MEMORY bytes, with a full snapshot every
+# REWIND_KEYFRAME_INTERVAL frames and the changes since it in between
+REWIND = False
+REWIND_SECONDS = 10
+REWIND_MEMORY = 2 * 1024 * 1024
+REWIND_KEYFRAME_INTERVAL = 60
+
+# ticks between the game states replay.add_keyframes() adds to a replay, and
+# the frames replay.Seeker.extract() gives before and after a time
+REPLAY_KEYFRAME_INTERVAL = 600
+REPLAY_EXTRACT_FRAMES = 30
+
+# most bytes a keyframe or the surface table of a replay may decompress to
+REPLAY_MAX_STATE_BYTES = 64 * 1024 * 1024
+# most ticks a replay file may hold, four hours at 60 fps
+REPLAY_MAX_TICKS = 4 * 60 * 60 * 60
+
+# replays source.verify plays: at most VERIFY_MAX_TICKS, half an hour, and
+# only the steps between ticks a game capped to 60 fps records. Its clock
+# waits for 16 ms per tick, so any VERIFY_WINDOW ticks take at least
+# VERIFY_MIN_AVERAGE_STEP ms each, less VERIFY_SLACK ms as the game reads the
+# time a little early or late. A single step is longer when the game is slow,
+# up to VERIFY_MAX_STEP ms
+VERIFY_MAX_TICKS = 30 * 60 * 60
+VERIFY_MAX_STEP = 1000
+VERIFY_WINDOW = 60
+VERIFY_MIN_AVERAGE_STEP = 16
+VERIFY_SLACK = 50
+
+# screen area covered by the score, coin, world and time labels
+INFO_RECT = (0, 0, SCREEN_WIDTH, 80)
+
 #STATES FOR ENTIRE GAME
 MAIN_MENU = 'main menu'
 LOAD_SCREEN = 'load screen'
@@ -0,0 +1,178 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Batched update of walking and falling goombas and koopas. The sprites stay the
+# objects the level, the player and the shells work with, each step gathers
+# their rects, velocities and states into arrays, integrates them and tests them
+# against the level colliders in one go, and writes the results back. The result
+# is the same as calling enemy.update(game_info, level) on each of them.
+
+import pygame as pg
+from . import constants as c
+from . import collision
+from .components import enemy
+
+np = collision.np
+
+# Enemy classes whose WALK and FALL states only use Enemy's movement
+BATCHED_TYPES = (enemy.Goomba, enemy.Koopa)
+
+# Function to round like pygame does when a float is assigned to a rect position
+def round_position(values):
+    return np.where(values >= 0, np.floor(values + 0.5), np.ceil(values - 0.5))
+
+# Class updating the awake enemies of a level
+class EnemyEngine():
+    def __init__(self, min_batch=c.BATCH_MIN_ENEMIES):
+        self.min_batch = min_batch
+        self.batched_count = 0
+
+    def update(self, sprites, game_info, level):
+        # Update sprites like sprite.update(game_info, level) for each of them
+        self.batched_count = 0
+        batch = []
+        if np is not None and not any(getattr(sprite, 'state', None) == c.SHELL_SLIDE
+                                      for sprite in sprites):
+            # a sliding shell kills the enemies it hits, so it needs them updated in order,
+            # fire sticks have no state
+            batch = [sprite for sprite in sprites if type(sprite) in BATCHED_TYPES
+                     and (sprite.state == c.WALK or sprite.state == c.FALL)]
+        if len(batch) < self.min_batch:
+            batch = []
+        batched = set(batch)
+        for sprite in sprites:
+            if sprite not in batched:
+                sprite.update(game_info, level)
+        if batch:
+            self.step(batch, game_info[c.CURRENT_TIME], level)
+            self.batched_count = len(batch)
+
+    def get_colliders(self, area, level):
+        # solid sprites around area, and which of them are in
+        # ground_step_pipe_group or sliders
+        colliders = collision.ColliderSnapshot(level.solid_group, area)
+        in_ground_step_pipe = colliders.get_mask(level.ground_step_pipe_group.has)
+        is_slider = colliders.get_mask(lambda sprite: sprite.name == c.MAP_SLIDER)
+        return colliders, in_ground_step_pipe, is_slider
+
+    def get_area(self, left, top, right, bottom):
+        # rect around the given positions, with room for moving out of a collision
+        return pg.Rect(int(left.min()) - 1, int(top.min()) - 1,
+                       int(right.max() - left.min()) + 2, int(bottom.max() - top.min()) + 2)
+
+    def step(self, sprites, current_time, level):
+        n = len(sprites)
+        rects = [sprite.rect for sprite in sprites]
+        x = np.array([rect.x for rect in rects], dtype=float)
+        y = np.array([rect.y for rect in rects], dtype=float)
+        w = np.array([rect.w for rect in rects], dtype=float)
+        h = np.array([rect.h for rect in rects], dtype=float)
+        x_vel = np.array([sprite.x_vel for sprite in sprites], dtype=float)
+        y_vel = np.array([sprite.y_vel for sprite in sprites], dtype=float)
+        gravity = np.array([sprite.gravity for sprite in sprites], dtype=float)
+        walking = np.array([sprite.state == c.WALK for sprite in sprites], dtype=bool)
+        right = np.array([sprite.direction == c.RIGHT for sprite in sprites], dtype=bool)
+        frame = np.array([sprite.frame_index for sprite in sprites])
+        timer = np.array([sprite.animate_timer for sprite in sprites], dtype=float)
+        in_range = np.array([bool(sprite.in_range) for sprite in sprites], dtype=bool)
+        range_start = np.array([sprite.range_start for sprite in sprites], dtype=float)
+        range_end = np.array([sprite.range_end for sprite in sprites], dtype=float)
+
+        # handle_state(): walk animation and gravity
+        animate = walking & (current_time - timer > 125)
+        new_frame = frame.copy()
+        new_frame[animate & right & (frame == 4)] = 5
+        new_frame[animate & right & (frame == 5)] = 4
+        new_frame[animate & ~right & (frame == 0)] = 1
+        new_frame[animate & ~right & (frame == 1)] = 0
+        image_frame = new_frame
+        accelerate = ~walking & (y_vel < 10)
+        y_vel = np.where(accelerate, y_vel + gravity, y_vel)
+
+        # check_x_collisions(): turn at the range ends or at ground, steps and pipes
+        x = round_position(x + x_vel)
+        to_right = in_range & (x < range_start)
+        to_left = in_range & ~to_right & (x + w > range_end)
+        x = np.where(to_right, range_start, x)
+        x = np.where(to_left, range_end - w, x)
+        area = self.get_area(x, y, x + w, y + h)
+        colliders, in_ground_step_pipe, is_slider = self.get_colliders(area, level)
+        hit = colliders.get_first_hits(x, y, w, h, in_ground_step_pipe)
+        hit = np.where(in_range, -1, hit)
+        collided = hit >= 0
+        hit_index = np.maximum(hit, 0)
+        if collided.any():
+            x = np.where(collided & right, colliders.x[hit_index] - w, x)
+            x = np.where(collided & ~right, colliders.x[hit_index] + colliders.w[hit_index], x)
+        to_left |= collided & right
+        to_right |= collided & ~right
+        turned = to_left | to_right
+        new_frame = np.where(walking & to_left, 0, new_frame)
+        new_frame = np.where(walking & to_right, 4, new_frame)
+
+        # check_y_collisions(): land on the first solid sprite hit from above,
+        # on the ground only ground, steps and pipes are checked
+        y = round_position(y + y_vel)
+        y_area = self.get_area(x, y, x + w, y + h + 1)
+        if not colliders.covers(y_area):
+            # moved out of the colliders fetched for the x collisions
+            colliders, in_ground_step_pipe, is_slider = self.get_colliders(
+                y_area.union(area), level)
+        on_ground = y + h >= c.GROUND_HEIGHT
+        hit = np.where(on_ground, colliders.get_first_hits(x, y, w, h, in_ground_step_pipe),
+                       colliders.get_first_hits(x, y, w, h))
+        hit_index = np.maximum(hit, 0)
+        landed = hit >= 0
+        if landed.any():
+            landed &= ~is_slider[hit_index] & (y <= colliders.y[hit_index])
+            y = np.where(landed, colliders.y[hit_index] - h, y)
+        walking |= landed
+
+        # level.check_is_falling(): fall when there is nothing 1 pixel below
+        falling = colliders.get_first_hits(x, y + 1, w, h) < 0
+        walking &= ~falling
+
+        dead = (x <= 0) | (y > level.viewport.bottom)
+
+        for i in range(n):
+            sprite = sprites[i]
+            sprite.current_time = current_time
+            sprite.image = sprite.frames[image_frame[i]]
+            sprite.frame_index = int(new_frame[i])
+            if animate[i]:
+                sprite.animate_timer = current_time
+            if turned[i]:
+                sprite.direction = c.RIGHT if to_right[i] else c.LEFT
+                sprite.x_vel = enemy.ENEMY_SPEED if to_right[i] else enemy.ENEMY_SPEED * -1
+            if landed[i]:
+                sprite.y_vel = 0
+            elif accelerate[i]:
+                sprite.y_vel = float(y_vel[i])
+            sprite.state = c.WALK if walking[i] else c.FALL
+            rects[i].x = int(x[i])
+            rects[i].y = int(y[i])
+            if dead[i]:
+                sprite.kill()
@@ -0,0 +1,222 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Gym-style environment for driving the game from a program, e.g. to train a
+# controller. Like headless, import it before anything else from the package:
+#
+#     from source import environment
+#     env = environment.Environment(observation=environment.OBSERVE_STATE)
+#     observation = env.reset(level_num=1)
+#     done = False
+#     while not done:
+#         action = environment.ACTION_RIGHT | environment.ACTION_JUMP
+#         observation, reward, terminated, truncated, info = env.step(action)
+#         done = terminated or truncated
+#
+# The level is only drawn when the observation is made of pixels.
+
+import pygame as pg
+from . import headless, observers
+from . import constants as c
+
+# Action bits, an action is any combination of them
+ACTION_RIGHT = 1
+ACTION_LEFT = 2
+ACTION_DOWN = 4
+ACTION_JUMP = 8
+ACTION_ACTION = 16
+ACTION_COUNT = 32
+
+ACTION_KEYS = [(ACTION_RIGHT, 'right'), (ACTION_LEFT, 'left'), (ACTION_DOWN, 'down'),
+               (ACTION_JUMP, 'jump'), (ACTION_ACTION, 'action')]
+
+# Observation types
+OBSERVE_NONE = None
+OBSERVE_STATE = 'state'
+OBSERVE_PIXELS = 'pixels'
+OBSERVE_TILES = 'tiles'
+
+# Key state of each action bitmask
+ACTION_KEY_STATES = [headless.keys(*[name for bit, name in ACTION_KEYS if action & bit])
+                     for action in range(ACTION_COUNT)]
+
+# Size of the state observation, see Environment.get_state()
+STATE_SIZE = 8
+
+# Function to get the dtype name and shape of the observations of an
+# Environment created with the given options
+def get_observation_layout(observation=OBSERVE_STATE, pixel_size=None, grayscale=False,
+                           frame_stack=1, **options):
+    if observation == OBSERVE_STATE:
+        return 'float64', (STATE_SIZE,)
+    elif observation == OBSERVE_PIXELS:
+        width, height = pixel_size or c.SCREEN_SIZE
+        shape = (height, width) if grayscale else (height, width, 3)
+        return 'uint8', shape if frame_stack == 1 else (frame_stack,) + shape
+    elif observation == OBSERVE_TILES:
+        return 'uint8', observers.TILE_WINDOW_SHAPE
+    return 'uint8', (0,)
+
+# Class running a level as an environment stepped by actions
+class Environment():
+    def __init__(self, observation=OBSERVE_STATE, frame_skip=1, max_steps=None,
+                 score_reward=1.0, coin_reward=0.0, ms_per_tick=16,
+                 pixel_size=None, grayscale=False, frame_stack=1):
+        # pixel_size, grayscale and frame_stack shape OBSERVE_PIXELS observations,
+        # see observers.PixelObserver
+        self.observation = observation
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.score_reward = score_reward
+        self.coin_reward = coin_reward
+        self.surface = None
+        self.pixel_observer = None
+        if observation == OBSERVE_PIXELS:
+            self.surface = pg.Surface(c.SCREEN_SIZE).convert()
+            self.pixel_observer = observers.PixelObserver(
+                self.surface, pixel_size, grayscale, frame_stack)
+        self.simulation = headless.Simulation(render=self.surface is not None,
+                                              ms_per_tick=ms_per_tick, surface=self.surface)
+        self.level = self.simulation.level
+        self.step_count = 0
+
+    def reset(self, level_num=1, player_name=c.PLAYER_MARIO):
+        # Start a new game on the given level, returns the first observation
+        self.simulation.reset(level_num, player_name)
+        if self.surface is not None:
+            self.level.draw(self.surface)
+        self.step_count = 0
+        self.score = self.simulation.game_info[c.SCORE]
+        self.coin_total = self.simulation.game_info[c.COIN_TOTAL]
+        if self.pixel_observer is not None:
+            return self.pixel_observer.reset()
+        return self.get_observation()
+
+    def step(self, action):
+        # Press the keys of action for frame_skip ticks, returns the observation,
+        # the reward, if the episode ended (death or castle), if it was cut short
+        # (max_steps) and an info dictionary
+        keys = ACTION_KEY_STATES[action]
+        player = self.level.player
+        for i in range(self.frame_skip):
+            # only the last tick is drawn, which is all the observation shows
+            self.simulation.step(keys, render=self.surface is not None and i == self.frame_skip - 1)
+            if player.dead or player.state == c.IN_CASTLE:
+                if self.surface is not None and i < self.frame_skip - 1:
+                    self.level.draw(self.surface)
+                break
+        self.step_count += 1
+
+        game_info = self.simulation.game_info
+        reward = ((game_info[c.SCORE] - self.score) * self.score_reward +
+                  (game_info[c.COIN_TOTAL] - self.coin_total) * self.coin_reward)
+        self.score = game_info[c.SCORE]
+        self.coin_total = game_info[c.COIN_TOTAL]
+
+        death = player.dead
+        castle = player.state == c.IN_CASTLE
+        time_out = death and self.level.overhead_info.time <= 0
+        terminated = death or castle
+        truncated = (not terminated and self.max_steps is not None and
+                     self.step_count >= self.max_steps)
+        info = {
+            'death': death,
+            'castle': castle,
+            'time_out': time_out,
+            'steps': self.step_count,
+            c.SCORE: game_info[c.SCORE],
+            c.COIN_TOTAL: game_info[c.COIN_TOTAL],
+            'x': player.rect.x,
+        }
+        return self.get_observation(), reward, terminated, truncated, info
+
+    def snapshot(self):
+        # The state of the episode, e.g. to try several actions from it
+        return (self.simulation.snapshot(), self.step_count)
+
+    def restore(self, state):
+        # Go back to a snapshot of this episode, returns its observation, frame
+        # stacks start again from it
+        level_state, self.step_count = state
+        self.simulation.restore(level_state)
+        self.score = self.simulation.game_info[c.SCORE]
+        self.coin_total = self.simulation.game_info[c.COIN_TOTAL]
+        if self.pixel_observer is not None:
+            self.level.draw(self.surface)
+            return self.pixel_observer.reset()
+        return self.get_observation()
+
+    def get_observation(self):
+        if self.observation == OBSERVE_STATE:
+            return self.get_state()
+        elif self.observation == OBSERVE_PIXELS:
+            # a view of the surface, overwritten by the next step
+            return self.pixel_observer.observe()
+        elif self.observation == OBSERVE_TILES:
+            # overwritten by the next step
+            return self.level.get_tile_window()
+        return None
+
+    def get_state(self):
+        # player position in the level, velocity and power, the camera position
+        # and the time left
+        player = self.level.player
+        return (player.rect.x, player.rect.y, player.x_vel, player.y_vel,
+                int(player.big), int(player.fire), self.level.viewport.x,
+                self.level.overhead_info.time)
+
+if __name__ == '__main__':
+    # Smoke check: python -m source.environment builds an environment for each
+    # kind of observation, alone and in worker processes, and checks the shapes
+    from . import vector_environment
+
+    checks = [
+        {'observation': OBSERVE_STATE},
+        {'observation': OBSERVE_TILES},
+        {'observation': OBSERVE_PIXELS},
+        {'observation': OBSERVE_PIXELS, 'pixel_size': (200, 150), 'grayscale': True,
+         'frame_stack': 4},
+    ]
+    for options in checks:
+        dtype, shape = get_observation_layout(**options)
+        env = Environment(**options)
+        observations = [env.reset()]
+        for i in range(10):
+            observations.append(env.step(ACTION_RIGHT)[0])
+        for observation in observations:
+            if getattr(observation, 'shape', (len(observation),)) != shape:
+                raise AssertionError('%r: observation of shape %r, expected %r' %
+                                     (options, getattr(observation, 'shape', None), shape))
+        envs = vector_environment.VectorEnvironment(2, 2, **options)
+        try:
+            envs.reset()
+            observations = envs.step([ACTION_RIGHT] * 2)[0]
+        finally:
+            envs.close()
+        if observations.shape != (2,) + shape or observations.dtype != dtype:
+            raise AssertionError('%r: vector observations of %s %r, expected %s %r' %
+                                 (options, observations.dtype, observations.shape, dtype, shape))
+        print('%r: ok' % options)
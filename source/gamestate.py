@@ -0,0 +1,305 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+__author__ = 'm0rniac'
+
+# Saving the whole state of a running game, a tools.Control and all of its
+# states, as bytes which can be loaded into a game made by main.create_game()
+# in another process, e.g. for the keyframes of seekable replays. Unlike a
+# level snapshot (see snapshot.py) it holds every object, so it is much larger
+# and slower to take. The state is pickled with the surfaces stored by how to
+# get them again: graphics loaded by setup by their name, frames of
+# tools.FRAME_CACHE by their sheet and rect, and any other surface by its
+# pixels in a SurfaceTable shared by all states saved to one file, so each
+# distinct surface is stored once.
+#
+# States are read from replay files which may come from anyone, so loading one
+# must not run code or make objects the game wouldn't. StateUnpickler only
+# finds the classes of the game's objects (see is_state_class()) and the
+# globals in SAFE_GLOBALS, in modules the game has already imported. It makes
+# the objects with __new__() and sets their attributes, the only functions it
+# calls are those in SAFE_GLOBALS, and the surfaces it loads are checked
+# against the graphics and limited in size. The surface table is a plain
+# binary layout which is checked while it is read, and nothing read is
+# decompressed to more than constants.REPLAY_MAX_STATE_BYTES. Anything else in
+# a state, e.g. a function like os.system or getattr, or a call to a class,
+# fails to load with pickle.UnpicklingError. A state can still hold any
+# attributes for those objects, so a crafted one can show a game the player
+# never played, but nothing more.
+
+import io
+import sys
+import zlib
+import pickle
+import struct
+import copyreg
+import collections
+import pygame as pg
+from . import setup, tools, rewind, snapshot, mapfile, streaming, observers, enemy_engine
+from . import constants as c
+from .states import level
+from .components import info, stuff
+
+# Control attributes saved, the others (screen, clock, recorder, playback,
+# render) belong to the game loading the state
+CONTROL_NAMES = ('done', 'current_time', 'keys', 'state_dict', 'state_name', 'state')
+
+# Globals a state may hold which are not classes of the game, the only things
+# it may call: rects, deques and map data (which is checked as it is read)
+SAFE_GLOBALS = frozenset((('collections', 'deque'), ('pygame', '__rect_constructor'),
+                          ('source.mapfile', 'MapData')))
+
+# Largest scale of a frame a state may ask the frame cache for, the game uses
+# up to 2.9
+MAX_FRAME_SCALE = 4
+
+# Width and height of a surface, flags (SURFACE_ALPHA_FORMAT and the ones
+# saying if there are a colorkey and an alpha), colorkey and alpha in the
+# surface table, each followed by its pixels, RGBA with per pixel alpha or RGB
+SURFACE = struct.Struct('<HHB4BB')
+SURFACE_ALPHA_FORMAT = 1
+SURFACE_COLORKEY = 2
+SURFACE_ALPHA = 4
+
+# Classes of the game's objects which are neither sprites, groups nor states
+STATE_CLASSES = (tools.KeyState, tools.ScaledBackground, rewind.Keyframe, rewind.Rewinder,
+                 snapshot.Layout, snapshot.Snapshotter, mapfile.MapData,
+                 streaming.MapStreamer, observers.TileGrid, enemy_engine.EnemyEngine,
+                 level.LevelTemplate, info.Info, stuff.Score)
+
+# Function to check if a global found by StateUnpickler is a class whose
+# objects are part of a game state
+def is_state_class(obj):
+    if not isinstance(obj, type):
+        return False
+    if not (obj.__module__.startswith(__package__ + '.') or obj.__module__ == 'pygame.sprite'):
+        return False
+    return issubclass(obj, (pg.sprite.Sprite, pg.sprite.AbstractGroup, tools.State) + STATE_CLASSES)
+
+# Class holding the pixels of the surfaces saved which can't be loaded from
+# the graphics or made again by the frame cache
+class SurfaceTable():
+    def __init__(self, records=()):
+        # size, alpha format, colorkey, alpha and pixels of each surface
+        self.records = list(records)
+        self.indices = {record: i for i, record in enumerate(self.records)}
+        self.gfx_names = {surface: name for name, surface in setup.GFX.items()}
+
+    def get_index(self, surface):
+        alpha_format = bool(surface.get_flags() & pg.SRCALPHA)
+        record = (surface.get_size(), alpha_format, surface.get_colorkey(), surface.get_alpha(),
+                  pg.image.tobytes(surface, 'RGBA' if alpha_format else 'RGB'))
+        index = self.indices.get(record)
+        if index is None:
+            index = self.indices[record] = len(self.records)
+            self.records.append(record)
+        return index
+
+    def get_surface(self, index):
+        size, alpha_format, colorkey, alpha, pixels = self.records[index]
+        if alpha_format:
+            return pg.image.frombytes(pixels, size, 'RGBA').convert_alpha()
+        surface = pg.image.frombytes(pixels, size, 'RGB').convert()
+        surface.set_colorkey(colorkey)
+        surface.set_alpha(alpha)
+        return surface
+
+    def get_id(self, surface):
+        # how to get the surface again
+        if surface is pg.display.get_surface():
+            return ('screen',)
+        name = self.gfx_names.get(surface)
+        if name is not None:
+            return ('gfx', name)
+        key = tools.FRAME_CACHE.get_key(surface)
+        if key is not None and key[0] in self.gfx_names:
+            sheet, rect, colorkey, scale, flip = key
+            return ('frame', self.gfx_names[sheet], rect, colorkey, scale, flip)
+        return ('surface', self.get_index(surface))
+
+    def dumps(self):
+        parts = [struct.pack('<I', len(self.records))]
+        for (width, height), alpha_format, colorkey, alpha, pixels in self.records:
+            flags = ((SURFACE_ALPHA_FORMAT if alpha_format else 0) |
+                     (SURFACE_COLORKEY if colorkey is not None else 0) |
+                     (SURFACE_ALPHA if alpha is not None else 0))
+            parts.append(SURFACE.pack(width, height, flags, *(colorkey or (0, 0, 0, 0)),
+                                      alpha or 0))
+            parts.append(pixels)
+        return zlib.compress(b''.join(parts))
+
+# Function to load a SurfaceTable saved by SurfaceTable.dumps(), raises
+# ValueError when data isn't one
+def load_surface_table(data):
+    data = tools.decompress(data, c.REPLAY_MAX_STATE_BYTES)
+    if len(data) < 4:
+        raise ValueError('truncated surface table')
+    count, = struct.unpack_from('<I', data)
+    offset = 4
+    records = []
+    for i in range(count):
+        if offset + SURFACE.size > len(data):
+            raise ValueError('truncated surface table')
+        width, height, flags, *values = SURFACE.unpack_from(data, offset)
+        colorkey, alpha = tuple(values[:4]), values[4]
+        offset += SURFACE.size
+        size = width * height * (4 if flags & SURFACE_ALPHA_FORMAT else 3)
+        if flags > 7 or offset + size > len(data):
+            raise ValueError('bad surface in surface table')
+        records.append(((width, height), bool(flags & SURFACE_ALPHA_FORMAT),
+                        colorkey if flags & SURFACE_COLORKEY else None,
+                        alpha if flags & SURFACE_ALPHA else None,
+                        data[offset:offset + size]))
+        offset += size
+    if offset != len(data):
+        raise ValueError('bad surface table')
+    return SurfaceTable(records)
+
+# Class pickling a game state with its surfaces stored in a SurfaceTable,
+# the frames kept for rewinding are left out unless rewind_history
+class StatePickler(pickle.Pickler):
+    def __init__(self, file, surfaces, rewind_history=True):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.surfaces = surfaces
+        self.rewind_history = rewind_history
+
+    def persistent_id(self, obj):
+        if isinstance(obj, pg.Surface):
+            return self.surfaces.get_id(obj)
+        return None
+
+    def reducer_override(self, obj):
+        if type(obj) is rewind.Rewinder and not self.rewind_history:
+            state = obj.__getstate__()
+            state.update(frames=collections.deque(), size=0, keyframe=None,
+                         frames_since_keyframe=0)
+            # copyreg.__newobj__ is pickled as an opcode rather than a global
+            return (copyreg.__newobj__, (rewind.Rewinder,), state)
+        return NotImplemented
+
+# Class loading a game state pickled by StatePickler. It is built on the
+# Python unpickler, whose opcodes can be checked one by one: globals must be
+# in the allow-list, only SAFE_GLOBALS are called, objects are made with
+# __new__() and get their attributes set, and persistent ids must name
+# surfaces the game has.
+class StateUnpickler(pickle._Unpickler):
+    dispatch = dict(pickle._Unpickler.dispatch)
+
+    def __init__(self, file, surfaces):
+        pickle._Unpickler.__init__(self, file)
+        self.surfaces = surfaces
+        # surfaces of the table loaded so far, each is made once per state
+        self.loaded = {}
+        self.safe_callables = [self.find_class(*name) for name in SAFE_GLOBALS]
+
+    def find_class(self, module, name):
+        # only modules already imported, so loading a state never imports one
+        if module in sys.modules and '.' not in name:
+            obj = getattr(sys.modules[module], name, None)
+            if (module, name) in SAFE_GLOBALS or is_state_class(obj):
+                return obj
+        raise pickle.UnpicklingError('%s.%s is not allowed in a game state' % (module, name))
+
+    def load_reduce(self):
+        func = self.stack[-2]
+        if not any(func is safe for safe in self.safe_callables):
+            raise pickle.UnpicklingError('%r is not called when loading a game state' % (func,))
+        pickle._Unpickler.load_reduce(self)
+    dispatch[pickle.REDUCE[0]] = load_reduce
+
+    def load_newobj(self):
+        cls, args = self.stack[-2:]
+        if not is_state_class(cls) or args != ():
+            raise pickle.UnpicklingError('%r is not made when loading a game state' % (cls,))
+        pickle._Unpickler.load_newobj(self)
+    dispatch[pickle.NEWOBJ[0]] = load_newobj
+
+    def load_build(self):
+        # attributes of a game object, or the state its __setstate__() takes
+        state, obj = self.stack[-1], self.stack[-2]
+        if not is_state_class(type(obj)) or not isinstance(state, dict):
+            raise pickle.UnpicklingError('%r is not set when loading a game state' % (obj,))
+        pickle._Unpickler.load_build(self)
+    dispatch[pickle.BUILD[0]] = load_build
+
+    def refuse(self):
+        raise pickle.UnpicklingError('opcode not allowed in a game state')
+    for opcode in (pickle.NEWOBJ_EX, pickle.OBJ, pickle.INST):
+        dispatch[opcode[0]] = refuse
+    del opcode
+
+    def persistent_load(self, pid):
+        try:
+            return self.get_surface(*pid)
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise pickle.UnpicklingError('bad surface %r in a game state' % (pid,))
+
+    def get_surface(self, kind, *args):
+        if kind == 'screen' and not args:
+            return pg.display.get_surface()
+        if kind == 'gfx':
+            name, = args
+            return setup.GFX[name]
+        if kind == 'frame':
+            name, rect, colorkey, scale, flip = args
+            sheet = setup.GFX[name]
+            x, y, width, height = (int(value) for value in rect)
+            flip_x, flip_y = (bool(value) for value in flip)
+            if colorkey is not None:
+                colorkey = tuple(int(value) for value in colorkey)
+            if (not sheet.get_rect().contains((x, y, width, height)) or
+                    not 0 < scale <= MAX_FRAME_SCALE):
+                raise ValueError('frame out of bounds')
+            return tools.get_frame(sheet, x, y, width, height, colorkey, float(scale),
+                                   flip_x, flip_y)
+        if kind == 'surface':
+            index, = args
+            if type(index) is not int or not 0 <= index < len(self.surfaces.records):
+                raise IndexError('no surface %r' % (index,))
+            if index not in self.loaded:
+                self.loaded[index] = self.surfaces.get_surface(index)
+            return self.loaded[index]
+        raise ValueError('unknown surface kind')
+
+# Function to save the state of game as bytes, adding surfaces to the
+# SurfaceTable surfaces. The rewind history, by far the largest part of a
+# level, can be left out when the game loading the state won't rewind.
+def dump_game(game, surfaces, rewind_history=True):
+    file = io.BytesIO()
+    StatePickler(file, surfaces, rewind_history).dump(
+        {name: getattr(game, name) for name in CONTROL_NAMES})
+    return zlib.compress(file.getvalue())
+
+# Function to load a state saved by dump_game() into game, raises
+# pickle.UnpicklingError or ValueError when data isn't a game state
+def load_game(game, data, surfaces):
+    data = tools.decompress(data, c.REPLAY_MAX_STATE_BYTES)
+    try:
+        state = StateUnpickler(io.BytesIO(data), surfaces).load()
+    except (TypeError, ValueError, KeyError, IndexError, AttributeError, EOFError) as error:
+        raise pickle.UnpicklingError('not a game state: %s' % error)
+    if type(state) is not dict or set(state) != set(CONTROL_NAMES):
+        raise pickle.UnpicklingError('not a game state')
+    game.__dict__.update(state)
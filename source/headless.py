@@ -0,0 +1,100 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Import this module before anything else from the package to run without a window:
+#
+#     from source import headless
+#     sim = headless.Simulation(level_num=1)
+#     while not sim.step(headless.keys('right', 'jump')):
+#         pass
+
+import os
+os.environ.setdefault('MARIO_HEADLESS', '1')
+
+from . import setup, tools
+from . import constants as c
+from .states import level
+
+# Function to create the game info dictionary a new game starts with
+def new_game_info(level_num=1, player_name=c.PLAYER_MARIO):
+    return {
+        c.COIN_TOTAL: 0,
+        c.SCORE: 0,
+        c.LIVES: 3,
+        c.TOP_SCORE: 0,
+        c.CURRENT_TIME: 0.0,
+        c.LEVEL_NUM: level_num,
+        c.PLAYER_NAME: player_name
+    }
+
+# Function to create a key state with the given tools.keybinding actions pressed
+def keys(*actions):
+    return tools.KeyState(tools.keybinding[action] for action in actions)
+
+# Class stepping a Level with supplied key states and a virtual clock
+class Simulation():
+    def __init__(self, level_num=1, player_name=c.PLAYER_MARIO, render=False, ms_per_tick=16,
+                 surface=None, rewind_memory=0):
+        self.render = render
+        # several simulations in one process each need their own surface to draw to
+        self.surface = surface if surface is not None else setup.SCREEN
+        self.ms_per_tick = ms_per_tick
+        # rewinding is for players, use snapshot() and restore() to go back
+        self.level = level.Level(rewind_memory)
+        self.reset(level_num, player_name)
+
+    def reset(self, level_num=1, player_name=c.PLAYER_MARIO):
+        # Start a new game on the given level
+        self.clock = tools.VirtualClock(self.ms_per_tick)
+        self.current_time = self.clock.get_ticks()
+        self.game_info = new_game_info(level_num, player_name)
+        self.level.player = None
+        self.level.startup(self.current_time, self.game_info)
+
+    def restart(self):
+        # Start the level again after it is done, like the load screen does after a
+        # death or a finished level, game info (lives, level num) is carried over
+        self.level.startup(self.current_time, self.level.cleanup())
+
+    def snapshot(self):
+        # The state of the level, see Level.snapshot()
+        return self.level.snapshot()
+
+    def restore(self, state):
+        # Set the level and the clock back to a snapshot
+        self.level.restore(state)
+        self.current_time = self.clock.ticks = self.level.current_time
+
+    def step(self, keys, render=None):
+        # Advance the game by one tick, drawing it if render (default self.render),
+        # returns True when the level is done
+        self.clock.tick()
+        self.current_time = self.clock.get_ticks()
+        if render is None:
+            render = self.render
+        surface = self.surface if render else None
+        self.level.update(surface, keys, self.current_time)
+        return self.level.done
@@ -29,22 +29,42 @@ from . import setup, tools
 from . import constants as c
 from .states import main_menu, load_screen, level
 
-# Define the main function of the script
-def main():
-    # Create an instance of the Control class from the 'tools' module
-    game = tools.Control()
+# Function to create the game, ready to run with game.main() or tick by tick
+# with game.step()
+def create_game(clock=None, recorder=None, playback=None, render=True, rewind_memory=0):
+    # Create an instance of the Control class from the 'tools' module,
+    # pass a tools.VirtualClock to run faster than real time, a replay.Recorder
+    # to record the session or a replay.Playback to play one back
+    game = tools.Control(clock, recorder, playback, render)
+
+    # a replay is played back with the rewinding it was recorded with
+    if playback is not None:
+        rewind_memory = playback.replay.rewind_memory
+    if recorder is not None:
+        recorder.replay.rewind_memory = rewind_memory
 
-    # Create a dictionary mapping state names to their respective state instances
+    # Create a dictionary mapping state names to their respective state instances,
+    # the load screen prepares the level's map while it is shown
+    level_state = level.Level(rewind_memory)
     state_dict = {
         c.MAIN_MENU: main_menu.Menu(),
-        c.LOAD_SCREEN: load_screen.LoadScreen(),
-        c.LEVEL: level.Level(),
+        c.LOAD_SCREEN: load_screen.LoadScreen(level_state),
+        c.LEVEL: level_state,
         c.GAME_OVER: load_screen.GameOver(),
         c.TIME_OUT: load_screen.TimeOut()
     }
 
     # Setup the states of the game using the state dictionary and set the initial state to 'MAIN_MENU'
     game.setup_states(state_dict, c.MAIN_MENU)
+    return game
+
+# Define the main function of the script
+def main(clock=None, recorder=None, playback=None, render=True, rewind_memory=None):
+    # rewinding is on when constants.REWIND is, unless rewind_memory says otherwise
+    if rewind_memory is None:
+        rewind_memory = c.REWIND_MEMORY if c.REWIND else 0
+    game = create_game(clock, recorder, playback, render, rewind_memory)
 
     # Start the main game loop
-    game.main()
\ No newline at end of file
+    game.main()
+    return game
\ No newline at end of file
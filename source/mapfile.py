@@ -0,0 +1,191 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Compiled level maps: the json maps in source/data/maps stay the source of truth,
+#
+#     python -m source.mapfile
+#
+# compiles each of them to a .map file with one fixed layout record per entity,
+# which load_map() memory-maps instead of parsing the json. A .map file is only
+# used while the size and modification time of its json match the ones it was
+# compiled from.
+
+import os
+import json
+import mmap
+import struct
+from . import constants as c
+
+MAGIC = b'SMAP'
+# Bump when FIELDS or the header change
+VERSION = 1
+
+# Record field holding the index of an enemy's group in the json enemy list
+ENEMY_GROUP = 'group'
+
+# Fields of each kind of map entity, in the order they are stored. A record is
+# a mask of the fields the json has followed by an int32 for each field.
+FIELDS = {
+    c.MAP_MAPS: ('start_x', 'end_x', 'player_x', 'player_y'),
+    c.MAP_GROUND: ('x', 'y', 'width', 'height'),
+    c.MAP_STEP: ('x', 'y', 'width', 'height'),
+    c.MAP_PIPE: ('x', 'y', 'width', 'height', 'type'),
+    c.MAP_SLIDER: ('x', 'y', 'num', 'direction', 'range_start', 'range_end', c.VELOCITY),
+    c.MAP_COIN: ('x', 'y'),
+    c.MAP_BRICK: ('x', 'y', 'type', c.COLOR, c.BRICK_NUM, 'direction'),
+    c.MAP_BOX: ('x', 'y', 'type'),
+    c.MAP_ENEMY: (ENEMY_GROUP, 'x', 'y', 'direction', 'type', c.COLOR, c.ENEMY_RANGE,
+                  'range_start', 'range_end', 'is_vertical', 'num'),
+    c.MAP_CHECKPOINT: ('x', 'y', 'width', 'height', 'type', c.ENEMY_GROUPID, c.MAP_INDEX),
+    c.MAP_FLAGPOLE: ('x', 'y', 'type'),
+}
+
+RECORDS = {kind: struct.Struct('<I' + 'i' * len(fields)) for kind, fields in FIELDS.items()}
+# magic, version, json size, json modification time, image name length, enemy group number
+HEADER = struct.Struct('<4sHqqHI')
+COUNTS = struct.Struct('<' + 'I' * len(FIELDS))
+
+# Function to get the paths of the json and compiled map of a level
+def get_paths(level_num, directory=os.path.join('source', 'data', 'maps')):
+    name = os.path.join(directory, 'level_' + str(level_num))
+    return name + '.json', name + '.map'
+
+# Function to compile the dict of a json map, source_stat is the os.stat() of the json
+def compile_map(data, source_stat=None):
+    image_name = data[c.MAP_IMAGE].encode()
+    chunks = []
+    counts = []
+    enemy_group_num = 0
+    for kind, fields in FIELDS.items():
+        if kind == c.MAP_ENEMY:
+            # the json has a list of {"<group index>": [enemies]} dicts
+            items = []
+            for index, group in enumerate(data.get(kind, [])):
+                items.extend(dict(item, **{ENEMY_GROUP: index}) for item in group[str(index)])
+                enemy_group_num = index + 1
+        else:
+            items = data.get(kind, [])
+        record = RECORDS[kind]
+        for item in items:
+            mask = 0
+            values = []
+            for i, field in enumerate(fields):
+                if field in item:
+                    mask |= 1 << i
+                    values.append(item[field])
+                else:
+                    values.append(0)
+            chunks.append(record.pack(mask, *values))
+        counts.append(len(items))
+
+    size, mtime = (source_stat.st_size, source_stat.st_mtime_ns) if source_stat else (0, 0)
+    header = HEADER.pack(MAGIC, VERSION, size, mtime, len(image_name), enemy_group_num)
+    return b''.join([header, image_name, COUNTS.pack(*counts)] + chunks)
+
+# Class reading a compiled map from a buffer, e.g. a mmap of a .map file
+class MapData():
+    def __init__(self, buffer):
+        self.buffer = buffer
+        (magic, version, self.source_size, self.source_mtime,
+            name_length, self.enemy_group_num) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a version %d compiled map' % VERSION)
+        offset = HEADER.size
+        self.image_name = bytes(buffer[offset:offset + name_length]).decode()
+        offset += name_length
+        counts = COUNTS.unpack_from(buffer, offset)
+        offset += COUNTS.size
+
+        view = memoryview(buffer)
+        self.views = {}
+        for kind, count in zip(FIELDS, counts):
+            end = offset + count * RECORDS[kind].size
+            self.views[kind] = view[offset:end]
+            offset = end
+
+    def __reduce__(self):
+        # for gamestate: a mmap can't be saved, its bytes are
+        return (MapData, (bytes(self.buffer),))
+
+    def count(self, kind):
+        return len(self.views[kind]) // RECORDS[kind].size
+
+    def records(self, kind, *fields):
+        '''tuples of the given fields for each record of kind, None for fields the
+        json map leaves out'''
+        layout = FIELDS[kind]
+        indexes = [layout.index(field) + 1 for field in fields]
+        required = sum(1 << (index - 1) for index in indexes)
+        for row in RECORDS[kind].iter_unpack(self.views[kind]):
+            if row[0] & required == required:
+                yield tuple([row[index] for index in indexes])
+            else:
+                yield tuple([row[index] if row[0] & (1 << (index - 1)) else None
+                             for index in indexes])
+
+    def items(self, kind):
+        '''a dict of the fields in the json map for each record of kind'''
+        layout = FIELDS[kind]
+        for row in RECORDS[kind].iter_unpack(self.views[kind]):
+            yield {field: value for i, (field, value) in enumerate(zip(layout, row[1:]))
+                   if row[0] & (1 << i)}
+
+# Function to load the map of a level, from its .map file if that is up to date
+def load_map(level_num):
+    json_path, map_path = get_paths(level_num)
+    source_stat = os.stat(json_path)
+    try:
+        with open(map_path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        map_data = MapData(buffer)
+        if (map_data.source_size, map_data.source_mtime) == (source_stat.st_size, source_stat.st_mtime_ns):
+            return map_data
+    except (OSError, ValueError, struct.error):
+        pass
+
+    with open(json_path) as f:
+        data = json.load(f)
+    return MapData(compile_map(data))
+
+# Function to compile the json maps of all levels
+def compile_all(directory=os.path.join('source', 'data', 'maps')):
+    compiled = []
+    for name in sorted(os.listdir(directory)):
+        base, ext = os.path.splitext(name)
+        if ext != '.json':
+            continue
+        json_path = os.path.join(directory, name)
+        with open(json_path) as f:
+            data = json.load(f)
+        map_path = os.path.join(directory, base + '.map')
+        with open(map_path, 'wb') as f:
+            f.write(compile_map(data, os.stat(json_path)))
+        compiled.append(map_path)
+    return compiled
+
+if __name__ == '__main__':
+    for path in compile_all():
+        print('compiled', path)
@@ -0,0 +1,193 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Observations of the game for controllers. The pixels are read from the memory
+# of the surface the level is drawn to, through pygame's buffer protocol, and
+# copied, optionally scaled down and turned to grayscale, into preallocated
+# arrays, optionally stacked with the previous frames. Tile grids show what is
+# in the viewport without drawing.
+
+import pygame as pg
+from . import constants as c
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Tile grid values, when sprites overlap a tile the highest value is kept
+TILE_EMPTY = 0
+TILE_SOLID = 1
+TILE_BRICK = 2
+TILE_BOX = 3
+TILE_POWERUP = 4
+TILE_ENEMY = 5
+TILE_PLAYER = 6
+
+# Top of the first tile row, puts the tile centers in the middle of the bricks
+# and boxes of the maps, which are laid out about half a tile down
+TILE_TOP = -21
+
+# Size of the tile grid window, (rows, columns), with a tile for each tile
+# center in the viewport
+TILE_WINDOW_SHAPE = (-(-(c.SCREEN_HEIGHT - TILE_TOP - c.TILE_SIZE // 2) // c.TILE_SIZE),
+                     -(-c.SCREEN_WIDTH // c.TILE_SIZE))
+
+# Function to get the pixels of a 24 or 32 bit surface as a (height, width, 3)
+# RGB array sharing its memory. The surface is locked, so it can't be blitted
+# to, until the array and every array made from it are gone.
+def get_pixels(surface):
+    return np.asarray(surface.get_view('3')).transpose(1, 0, 2)
+
+# Class observing the pixels of a surface, each observe() gets the current
+# frame as a (height, width, 3) RGB or (height, width) grayscale uint8 array,
+# or with stack > 1 the last stack frames as a (stack, ...) array, oldest first.
+# The arrays returned are overwritten by the next observe(). The surface is only
+# locked while observe() reads it.
+class PixelObserver():
+    def __init__(self, surface, size=None, grayscale=False, stack=1):
+        self.surface = surface
+        self.scaled_surface = None
+        if size is not None and tuple(size) != surface.get_size():
+            self.scaled_surface = pg.Surface(size, 0, surface)
+        self.grayscale = grayscale
+        self.stack = stack
+        width, height = (self.scaled_surface or surface).get_size()
+        self.frame_shape = (height, width) if grayscale else (height, width, 3)
+        if grayscale:
+            self.gray_sum = np.empty((height, width), np.uint16)
+            self.gray_part = np.empty((height, width), np.uint16)
+        # each frame is written twice, at index and index + stack, so the last
+        # stack frames are always one contiguous slice
+        self.frames = np.zeros((stack * 2,) + self.frame_shape, np.uint8)
+        self.index = 0
+
+    def get_shape(self):
+        return self.frame_shape if self.stack == 1 else (self.stack,) + self.frame_shape
+
+    def reset(self):
+        # Start a new episode, filling the stack with the current frame
+        observation = self.observe()
+        if self.stack > 1:
+            self.frames[:] = self.frames[self.index - 1]
+            return self.frames[self.index:self.index + self.stack]
+        return observation
+
+    def observe(self):
+        surface = self.surface
+        if self.scaled_surface is not None:
+            pg.transform.scale(surface, self.scaled_surface.get_size(), self.scaled_surface)
+            surface = self.scaled_surface
+
+        frame = self.frames[self.index]
+        pixels = get_pixels(surface)
+        if self.grayscale:
+            # ITU-R 601 luma in 8 bit fixed point, (77 r + 150 g + 29 b) / 256
+            np.multiply(pixels[:, :, 0], np.uint16(77), out=self.gray_sum)
+            np.multiply(pixels[:, :, 1], np.uint16(150), out=self.gray_part)
+            self.gray_sum += self.gray_part
+            np.multiply(pixels[:, :, 2], np.uint16(29), out=self.gray_part)
+            self.gray_sum += self.gray_part
+            np.right_shift(self.gray_sum, 8, out=frame, casting='unsafe')
+        else:
+            # channel by channel, a lot faster than copying the reversed channels at once
+            for channel in range(3):
+                frame[:, :, channel] = pixels[:, :, channel]
+        # unlock the surface, so the next frame can be drawn to it
+        del pixels
+        if self.stack == 1:
+            return frame
+
+        self.frames[self.index + self.stack] = frame
+        self.index = (self.index + 1) % self.stack
+        return self.frames[self.index:self.index + self.stack]
+
+# Function to get the tiles along an axis covered by a sprite from start to end,
+# first and last + 1, as the tiles with their center in it, or if there are none
+# the tile of its middle
+def get_tile_span(start, end, origin=0):
+    size = c.TILE_SIZE
+    first = -((origin + size // 2 - start) // size)
+    last = -((origin + size // 2 - end) // size)
+    if first >= last:
+        first = ((start + end) // 2 - origin) // size
+        last = first + 1
+    return first, last
+
+# Class keeping the ground, steps and pipes of a level as a uint8 tile grid
+# built from its map data, get_window() copies the part under the viewport and
+# stamps the bricks, boxes, sliders, powerups, enemies and the player on it
+class TileGrid():
+    def __init__(self, map_data):
+        rows, columns = TILE_WINDOW_SHAPE
+        size = c.TILE_SIZE
+        rects = [record for kind in (c.MAP_GROUND, c.MAP_STEP, c.MAP_PIPE)
+                 for record in map_data.records(kind, 'x', 'y', 'width', 'height')]
+        end_x = max([x + width for x, y, width, height in rects] +
+                    [end_x for end_x, in map_data.records(c.MAP_MAPS, 'end_x')])
+        # room for a whole window past the end of the level
+        self.tiles = np.zeros((rows, end_x // size + columns + 1), np.uint8)
+        for x, y, width, height in rects:
+            self.stamp(self.tiles, 0, x, y, x + width, y + height, TILE_SOLID)
+        self.window = np.zeros(TILE_WINDOW_SHAPE, np.uint8)
+        self.window_rect = pg.Rect(0, TILE_TOP, columns * size, rows * size)
+
+    def stamp(self, tiles, column, left, top, right, bottom, value):
+        # set the tiles of the rect, columns counted from column, to value
+        # unless they already have a higher one
+        first_row, last_row = get_tile_span(top, bottom, TILE_TOP)
+        first_column, last_column = get_tile_span(left, right)
+        area = tiles[max(first_row, 0):max(last_row, 0),
+                     max(first_column - column, 0):max(last_column - column, 0)]
+        if area.size:
+            area[area < value] = value
+
+    def get_window(self, level):
+        # the tile grid of the viewport, overwritten by the next call
+        size = c.TILE_SIZE
+        column = max(get_tile_span(level.viewport.x, level.viewport.x + size)[0], 0)
+        window = self.window
+        window[:] = self.tiles[:, column:column + window.shape[1]]
+        self.window_rect.x = column * size
+        area = self.window_rect
+        for group, value in ((level.slider_group, TILE_SOLID),
+                             (level.brick_group, TILE_BRICK),
+                             (level.box_group, TILE_BOX),
+                             (level.powerup_group, TILE_POWERUP),
+                             (level.enemy_group, TILE_ENEMY),
+                             (level.shell_group, TILE_ENEMY),
+                             (level.player_group, TILE_PLAYER)):
+            sprites = (group.sprites_in_rect(area) if hasattr(group, 'sprites_in_rect')
+                       else group.sprites())
+            for sprite in sprites:
+                if value == TILE_POWERUP and sprite.type == c.TYPE_FIREBALL:
+                    continue
+                tile = value
+                if value == TILE_BOX and sprite.state == c.OPENED:
+                    tile = TILE_SOLID
+                rect = sprite.rect
+                self.stamp(window, column, rect.left, rect.top, rect.right, rect.bottom, tile)
+        return window
@@ -0,0 +1,379 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Recording and playback of a game session. A recording holds for each tick of
+# Control the game time and which of the game's keys were pressed, so playing
+# it back through Control with the recorded times gives the same game, and
+# can run as fast as the game updates, with or without drawing:
+#
+#     python -m source.replay record session.rpl [--rewind]
+#     python -m source.replay play session.rpl [--render]
+#
+# Playing back prints the final game info and if it matches the recorded one.
+#
+# To reach a tick without playing everything before it, a replay can hold the
+# whole game state (see gamestate.py) every keyframe interval ticks, added by
+# playing it back once. A Seeker then loads the last keyframe before a tick and
+# plays on from there, and extracts the frames around given times:
+#
+#     python -m source.replay index session.rpl [interval]
+#     python -m source.replay frames session.rpl directory time...
+#
+# A replay file may come from anyone. Keyframes are pickles, and the format
+# relies on gamestate.StateUnpickler, which only makes the game's objects and
+# sets their attributes, never calling anything but a few constructors of
+# plain values, and on the surface table being a checked binary layout, with
+# everything decompressed limited in size. Keyframes are not signed though, so
+# a tampered one can put the game in any state made of those objects: frames
+# extracted from a file indexed elsewhere show what its keyframes say.
+# Checking a run means playing it from the start, which never loads the
+# keyframes (see verify.py).
+
+import os
+import sys
+import json
+import zlib
+import bisect
+import struct
+from array import array
+import pygame as pg
+from . import tools
+from . import constants as c
+
+MAGIC = b'SRPL'
+# Bump when KEYS or the file layout change
+VERSION = 5
+
+# magic, version, number of ticks, game time of the first tick, rewind memory
+# of the levels (0 when rewinding was off), size of the compressed key masks
+# and time steps, size of the final game info json, size of the surface table,
+# keyframe interval and number of keyframes, followed by the masks and steps,
+# the json, the surface table, a KEYFRAME for each keyframe and the keyframes
+HEADER = struct.Struct('<4sHIqIIIIII')
+
+# tick, file offset and size of a keyframe
+KEYFRAME = struct.Struct('<IQI')
+
+# Keys recorded, a tick stores bit i when KEYS[i] is pressed
+KEYS = list(dict.fromkeys(list(tools.keybinding.values()) + [pg.K_UP, pg.K_RETURN]))
+
+# Key state of each mask
+KEY_STATES = [tools.KeyState(key for i, key in enumerate(KEYS) if mask & 1 << i)
+              for mask in range(1 << len(KEYS))]
+
+# Bit of the rewind key in the masks
+REWIND_MASK = 1 << KEYS.index(tools.keybinding['rewind'])
+
+# Function to get the key mask of a key state
+def get_mask(keys):
+    mask = 0
+    for i, key in enumerate(KEYS):
+        if keys[key]:
+            mask |= 1 << i
+    return mask
+
+# Class holding a recorded session
+class Replay():
+    def __init__(self, masks, steps, start_time, game_info=None, rewind_memory=0):
+        # masks and steps are the key mask and the time since the last tick of each tick
+        self.masks = masks
+        self.steps = steps
+        self.start_time = start_time
+        self.game_info = game_info
+        # the rewind key only rewinds when the game was recorded with rewinding
+        self.rewind_memory = rewind_memory
+        # (tick, game state) of each keyframe and the gamestate.SurfaceTable
+        # they share, see add_keyframes()
+        self.keyframe_interval = 0
+        self.keyframes = []
+        self.surfaces = b''
+        self.times = None
+        self.last_rewind = None
+
+    def __len__(self):
+        return len(self.masks)
+
+    def get_times(self):
+        # game time of each tick since the first one
+        if self.times is None:
+            self.times = array('q', [0])
+            for step in self.steps[1:]:
+                self.times.append(self.times[-1] + step)
+        return self.times
+
+    def get_last_rewind(self):
+        # the last tick the rewind key is pressed in, -1 when it never is
+        if self.last_rewind is None:
+            self.last_rewind = -1
+            for tick in range(len(self.masks) - 1, -1, -1):
+                if self.masks[tick] & REWIND_MASK:
+                    self.last_rewind = tick
+                    break
+        return self.last_rewind
+
+    def get_tick(self, time):
+        # the tick running at a game time since the first tick
+        return max(0, bisect.bisect_right(self.get_times(), time) - 1)
+
+    def save(self, path):
+        info = json.dumps(self.game_info).encode() if self.game_info is not None else b''
+        # masks first and steps after, long runs of equal values compress well
+        inputs = zlib.compress(bytes(self.masks) + self.steps.tobytes(), 9)
+        offset = (HEADER.size + len(inputs) + len(info) + len(self.surfaces)
+                  + KEYFRAME.size * len(self.keyframes))
+        index = []
+        for tick, state in self.keyframes:
+            index.append(KEYFRAME.pack(tick, offset, len(state)))
+            offset += len(state)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.masks), self.start_time,
+                                self.rewind_memory, len(inputs), len(info), len(self.surfaces),
+                                self.keyframe_interval, len(self.keyframes)))
+            f.write(inputs)
+            f.write(info)
+            f.write(self.surfaces)
+            f.write(b''.join(index))
+            for tick, state in self.keyframes:
+                f.write(state)
+
+# Function to read a replay file up to its keyframes, returns the Replay and
+# the tick, offset and size of each keyframe
+def read_replay(f, path):
+    data = f.read(HEADER.size)
+    (magic, version, count, start_time, rewind_memory, inputs_size, info_size, surfaces_size,
+        keyframe_interval, keyframe_count) = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a version %d replay' % (path, VERSION))
+    if count > c.REPLAY_MAX_TICKS or rewind_memory > c.REWIND_MEMORY:
+        raise ValueError('%s is longer or keeps more rewind history than a replay may' % path)
+    # a key mask byte and a 4 byte step per tick
+    body = tools.decompress(f.read(inputs_size), count * 5)
+    if len(body) != count * 5:
+        raise ValueError('%s has truncated inputs' % path)
+    steps = array('I')
+    steps.frombytes(body[count:])
+    if sys.byteorder == 'big':
+        steps.byteswap()
+    info = f.read(info_size)
+    game_info = json.loads(info) if info_size else None
+    replay = Replay(bytearray(body[:count]), steps, start_time, game_info, rewind_memory)
+    replay.keyframe_interval = keyframe_interval
+    replay.surfaces = f.read(surfaces_size)
+    index = list(KEYFRAME.iter_unpack(f.read(KEYFRAME.size * keyframe_count)))
+    return replay, index
+
+# Function to load a replay saved by Replay.save()
+def load_replay(path):
+    with open(path, 'rb') as f:
+        replay, index = read_replay(f, path)
+        for tick, offset, size in index:
+            f.seek(offset)
+            replay.keyframes.append((tick, f.read(size)))
+    return replay
+
+# Function to add a keyframe every interval ticks to replay by playing it back
+# without drawing, returns the game played
+def add_keyframes(replay, interval=c.REPLAY_KEYFRAME_INTERVAL):
+    from . import main, gamestate
+    surfaces = gamestate.SurfaceTable()
+    replay.keyframe_interval = interval
+    replay.keyframes = []
+    game = main.create_game(playback=Playback(replay), render=False)
+    while not game.done:
+        tick = game.playback.index
+        if tick and tick % interval == 0:
+            # the rewind history is only needed up to the last tick rewinding
+            rewind_history = tick <= replay.get_last_rewind()
+            replay.keyframes.append((tick, gamestate.dump_game(game, surfaces, rewind_history)))
+        step(game)
+    replay.surfaces = surfaces.dumps()
+    return game
+
+# Function to run a tick of game playing a replay back, keeping no rewind
+# history after the last tick rewinding as nothing goes back to it
+def step(game):
+    if game.playback.index > game.playback.replay.get_last_rewind():
+        for state in game.state_dict.values():
+            if getattr(state, 'rewind_memory', 0):
+                state.rewind_memory = 0
+                state.rewinder = None
+    game.step()
+
+# Class recording the ticks of a Control
+class Recorder():
+    def __init__(self, path):
+        self.path = path
+        self.replay = Replay(bytearray(), array('I'), 0)
+        self.last_time = None
+
+    def record(self, current_time, keys):
+        current_time = int(current_time)
+        if self.last_time is None:
+            self.replay.start_time = self.last_time = current_time
+        self.replay.masks.append(get_mask(keys))
+        self.replay.steps.append(current_time - self.last_time)
+        self.last_time = current_time
+
+    def save(self, game_info):
+        replay = self.replay
+        replay.game_info = dict(game_info)
+        if sys.byteorder == 'big':
+            replay = Replay(replay.masks, array('I', replay.steps), replay.start_time,
+                            replay.game_info, replay.rewind_memory)
+            replay.steps.byteswap()
+        replay.save(self.path)
+
+# Class playing a replay back as the clock and keyboard of a Control,
+# ticking never waits so the game runs uncapped
+class Playback():
+    def __init__(self, replay):
+        self.replay = replay
+        self.index = 0
+        self.ticks = replay.start_time
+
+    @property
+    def done(self):
+        return self.index >= len(self.replay)
+
+    def get_ticks(self):
+        return self.ticks
+
+    def get_keys(self):
+        return KEY_STATES[self.replay.masks[self.index]]
+
+    def seek(self, index):
+        # Continue from the start of tick index
+        self.index = index
+        self.ticks = self.replay.start_time + self.replay.get_times()[index]
+
+    def tick(self, fps=None):
+        self.index += 1
+        if self.done:
+            return 0
+        step = self.replay.steps[self.index]
+        self.ticks += step
+        return step
+
+# Class seeking to any tick of a replay file, loading its keyframes from the
+# file when needed so it stays cheap to open many replays
+class Seeker():
+    def __init__(self, path, render=True):
+        self.file = open(path, 'rb')
+        self.replay, self.index = read_replay(self.file, path)
+        self.keyframe_ticks = [tick for tick, offset, size in self.index]
+        self.render = render
+        self.surfaces = None
+        self.game = None
+
+    def close(self):
+        self.file.close()
+
+    def load_keyframe(self, i):
+        from . import main, gamestate
+        tick, offset, size = self.index[i]
+        if self.surfaces is None:
+            self.surfaces = gamestate.load_surface_table(self.replay.surfaces)
+        self.file.seek(offset)
+        state = self.file.read(size)
+        playback = Playback(self.replay)
+        playback.seek(tick)
+        self.game = main.create_game(playback=playback, render=self.render)
+        gamestate.load_game(self.game, state, self.surfaces)
+
+    def seek(self, tick):
+        # The game at the start of tick, played on from the last keyframe
+        # before it, or from where the last seek left it if that is closer
+        from . import main
+        i = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+        keyframe_tick = self.keyframe_ticks[i] if i >= 0 else 0
+        if self.game is None or not keyframe_tick <= self.game.playback.index <= tick:
+            if i >= 0:
+                self.load_keyframe(i)
+            else:
+                self.game = main.create_game(playback=Playback(self.replay), render=self.render)
+        while self.game.playback.index < tick and not self.game.done:
+            step(self.game)
+        return self.game
+
+    def extract(self, times, before=c.REPLAY_EXTRACT_FRAMES, after=c.REPLAY_EXTRACT_FRAMES):
+        # The frames drawn in the ticks from before ticks before to after ticks
+        # after each game time (since the first tick), as a list of (tick,
+        # surface) for each time. The times are visited in order so close ones
+        # share the playing between them.
+        if not self.render:
+            raise ValueError('extracting frames needs a Seeker which renders')
+        frames = [None] * len(times)
+        for i in sorted(range(len(times)), key=lambda i: times[i]):
+            tick = self.replay.get_tick(times[i])
+            game = self.seek(max(0, tick - before))
+            frames[i] = []
+            while game.playback.index <= tick + after and not game.done:
+                index = game.playback.index
+                step(game)
+                if not game.done:
+                    frames[i].append((index, game.screen.copy()))
+        return frames
+
+# Function to compare the final game info of a playback with the recorded one,
+# returns the keys which differ
+def get_game_info_differences(recorded, played):
+    return sorted(key for key in set(recorded) | set(played)
+                  if recorded.get(key) != played.get(key))
+
+if __name__ == '__main__':
+    command, path = sys.argv[1:3]
+    render = command == 'record' or '--render' in sys.argv[3:]
+    if not render:
+        os.environ.setdefault('MARIO_HEADLESS', '1')
+    from . import main
+
+    if command == 'index':
+        replay = load_replay(path)
+        interval = int(sys.argv[3]) if len(sys.argv) > 3 else c.REPLAY_KEYFRAME_INTERVAL
+        add_keyframes(replay, interval)
+        replay.save(path)
+        print('added', len(replay.keyframes), 'keyframes to', path, '(%d bytes)' % os.path.getsize(path))
+    elif command == 'frames':
+        directory = sys.argv[3]
+        times = [int(time) for time in sys.argv[4:]]
+        seeker = Seeker(path)
+        for time, frames in zip(times, seeker.extract(times)):
+            for tick, surface in frames:
+                pg.image.save(surface, os.path.join(directory, '%d_%06d.png' % (time, tick)))
+        seeker.close()
+    elif command == 'record':
+        rewind_memory = c.REWIND_MEMORY if '--rewind' in sys.argv[3:] else None
+        game = main.main(recorder=Recorder(path), rewind_memory=rewind_memory)
+        print('recorded', len(game.recorder.replay), 'ticks to', path)
+    else:
+        replay = load_replay(path)
+        game = main.main(playback=Playback(replay), render=render)
+        game_info = json.loads(json.dumps(game.get_game_info()))
+        print('played', game.playback.index, 'ticks, final game info:', game_info)
+        differences = get_game_info_differences(replay.game_info or {}, game_info)
+        print('game info differs in: ' + ', '.join(differences) if differences
+              else 'game info matches the recording')
+        sys.exit(1 if differences else 0)
@@ -0,0 +1,178 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+__author__ = 'm0rniac'
+
+# Rewinding a level: the last seconds of a level run are kept as snapshots
+# (see snapshot.py) and holding tools.keybinding['rewind'] steps the level back
+# one frame per update. Every keyframe_interval frames a full snapshot is kept
+# as a keyframe and the frames in between only hold what differs from it, so
+# the sprites which don't change (ground, bricks, resting boxes) are stored once
+# per keyframe. The oldest frames are dropped to keep at most seconds of
+# history in at most memory bytes. To see how much memory a second takes:
+#
+#     python -m source.rewind [ticks]
+
+import sys
+import zlib
+import collections
+from . import snapshot
+from . import constants as c
+
+# Class holding a compressed full snapshot and the number of frames kept which need it
+class Keyframe():
+    def __init__(self, buffer):
+        self.data = zlib.compress(buffer, 1)
+        self.frame_count = 0
+
+    def __getstate__(self):
+        # for gamestate: the snapshot is saved as plain values, see snapshot.get_values()
+        return {'values': get_values(self.data), 'frame_count': self.frame_count}
+
+    def __setstate__(self, state):
+        self.data = get_data(state['values'])
+        self.frame_count = state['frame_count']
+
+# Class keeping the recent frames of a level run
+class Rewinder():
+    def __init__(self, level, seconds=c.REWIND_SECONDS, memory=c.REWIND_MEMORY,
+                 keyframe_interval=c.REWIND_KEYFRAME_INTERVAL):
+        self.level = level
+        self.seconds = seconds
+        self.memory = memory
+        self.keyframe_interval = keyframe_interval
+        # game time, keyframe and compressed delta (None for the keyframe itself)
+        # of each frame, oldest first
+        self.frames = collections.deque()
+        # bytes of compressed snapshots kept
+        self.size = 0
+        # the keyframe new frames are stored against, with its snapshot
+        self.keyframe = None
+        self.keyframe_buffer = None
+        self.frames_since_keyframe = 0
+        # the last keyframe restored from, with its snapshot
+        self.restored = (None, None)
+
+    def __getstate__(self):
+        # for gamestate: snapshots which are kept compressed as well are left out
+        state = self.__dict__.copy()
+        state.update(keyframe_buffer=None, restored=(None, None))
+        state['frames'] = collections.deque(
+            (time, keyframe, None if delta is None else get_values(delta))
+            for time, keyframe, delta in self.frames)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.frames = collections.deque(
+            (time, keyframe, None if values is None else get_data(values))
+            for time, keyframe, values in self.frames)
+        if self.keyframe is not None:
+            self.keyframe_buffer = zlib.decompress(self.keyframe.data)
+
+    def record(self):
+        # Keep the current frame of the level
+        level = self.level
+        if self.keyframe is None or self.frames_since_keyframe >= self.keyframe_interval:
+            self.keyframe_buffer = level.snapshot()
+            self.keyframe = Keyframe(self.keyframe_buffer)
+            self.frames_since_keyframe = 0
+            self.size += len(self.keyframe.data)
+            delta = None
+        else:
+            delta = zlib.compress(level.snapshot(self.keyframe_buffer), 1)
+            self.size += len(delta)
+        self.keyframe.frame_count += 1
+        self.frames_since_keyframe += 1
+        self.frames.append((level.current_time, self.keyframe, delta))
+
+        oldest_time = level.current_time - self.seconds * 1000
+        while len(self.frames) > 1 and (self.frames[0][0] < oldest_time or self.size > self.memory):
+            self.drop(self.frames.popleft())
+
+    def drop(self, frame):
+        _, keyframe, delta = frame
+        if delta is not None:
+            self.size -= len(delta)
+        keyframe.frame_count -= 1
+        if keyframe.frame_count == 0:
+            self.size -= len(keyframe.data)
+
+    def step_back(self):
+        # Set the level back to the frame before the last one kept, returns
+        # False when there is none
+        if len(self.frames) < 2:
+            return False
+        self.drop(self.frames.pop())
+        _, keyframe, delta = self.frames[-1]
+        if self.restored[0] is not keyframe:
+            self.restored = (keyframe, zlib.decompress(keyframe.data))
+        buffer = self.restored[1]
+        if delta is None:
+            self.level.restore(buffer)
+        else:
+            self.level.restore(zlib.decompress(delta), buffer)
+        # frames recorded from here on start with a new keyframe
+        self.keyframe = None
+        return True
+
+    def get_seconds(self):
+        # Game time covered by the frames kept
+        if not self.frames:
+            return 0.0
+        return (self.frames[-1][0] - self.frames[0][0]) / 1000.0
+
+    def get_bytes_per_second(self):
+        # Memory taken by a second of history
+        seconds = self.get_seconds()
+        return self.size / seconds if seconds else 0.0
+
+# Function to get the values of a compressed snapshot
+def get_values(data):
+    return snapshot.get_values(zlib.decompress(data))
+
+# Function to compress the snapshot made from values, see snapshot.get_buffer()
+def get_data(values):
+    return zlib.compress(snapshot.get_buffer(values), 1)
+
+if __name__ == '__main__':
+    import time
+    from . import headless
+
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # level 4's fire sticks can't be updated with the other enemies yet
+    for level_num in (1, 2, 3):
+        sim = headless.Simulation(level_num, rewind_memory=c.REWIND_MEMORY)
+        # run right, jumping now and then
+        key_states = [headless.keys('right', 'action'), headless.keys('right', 'action', 'jump')]
+        start = time.perf_counter()
+        for tick in range(ticks):
+            if sim.step(key_states[tick % 40 < 12]):
+                break
+        elapsed = time.perf_counter() - start
+        rewinder = sim.level.rewinder
+        print('level %d: %d frames, %.1f s of history in %d bytes, %d bytes/s, %.3f ms per tick'
+              % (level_num, len(rewinder.frames), rewinder.get_seconds(), rewinder.size,
+                 rewinder.get_bytes_per_second(), elapsed * 1000 / (tick + 1)))
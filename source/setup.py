@@ -28,10 +28,18 @@ import os
 import pygame as pg
 from . import constants as c
 from . import tools
+from . import assets
 
+# Run without a window when MARIO_HEADLESS is set, e.g. for simulations on servers
+HEADLESS = os.environ.get('MARIO_HEADLESS', '') not in ('', '0')
 
-# Initialize pygame
-pg.init()
+if HEADLESS:
+    # SDL's dummy driver still gives a display surface, which surface.convert() needs
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pg.display.init()
+else:
+    # Initialize pygame
+    pg.init()
 
 # Set allowed events for the game
 pg.event.set_allowed([pg.KEYDOWN, pg.KEYUP, pg.QUIT])
@@ -45,5 +53,12 @@ SCREEN = pg.display.set_mode(c.SCREEN_SIZE)
 # Get the rectangle representing the dimensions of the game window
 SCREEN_RECT = SCREEN.get_rect()
 
+# Assets baked by "python -m source.assets", only used while they match the sources
+ASSET_CACHE = assets.AssetCache(os.path.join("resources", "cache"),
+                                [os.path.join("resources", "graphics"), os.path.join("source", "data", "player")])
+
 # Load all the graphics from the specified directory
-GFX = tools.load_all_gfx(os.path.join("resources", "graphics"))
+GFX = tools.load_all_gfx(os.path.join("resources", "graphics"), cache=ASSET_CACHE)
+
+# Load the baked frames the sprite components get from tools.get_frame
+ASSET_CACHE.load_frames(tools.FRAME_CACHE, GFX)
@@ -0,0 +1,359 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Snapshots of a running Level, see Level.snapshot() and Level.restore(). A
+# snapshot is a marshalled buffer holding the attributes of the level, the
+# player, every sprite in the level's groups, the overhead info and the moving
+# scores, plus the members of each group. Numbers, strings and rects are
+# stored by value. Everything else (images, frame lists, groups, other sprites)
+# is stored as an index into a table of the objects seen while this level is
+# played, so no surface is ever copied and a snapshot is only valid for the
+# level run it was taken from. Sprites removed since the snapshot stay in the
+# table, restoring a snapshot puts them back. The one state kept in surfaces,
+# the alpha the player's frames flash with while invincible, is stored too.
+#
+# Sprites in spatial groups outside the level's active region are asleep and
+# don't change, and neither do enemies waiting for their checkpoint or static
+# sprites like pipes and poles. So the encoded record of each object is kept and
+# only the objects which may have changed since the last snapshot or restore are
+# encoded again, and restoring skips the objects already in the state of the
+# snapshot.
+#
+# A snapshot can also be taken as a delta against an earlier full snapshot, a
+# keyframe, holding only the records which differ from it. Restoring a delta
+# needs its keyframe too.
+#
+# Snapshots saved in files (the rewind history in the keyframes of a replay)
+# are turned into plain values with get_values() and back with get_buffer(),
+# so a buffer read from a file is never passed to marshal.loads().
+
+import marshal
+import itertools
+import pygame as pg
+from . import spatial
+from .components import stuff
+
+# Bump when the buffer layout changes
+VERSION = 2
+
+# Number of each Snapshotter, a snapshot can only be restored by the one which took it
+SESSIONS = itertools.count()
+
+# Types stored by value
+PLAIN_TYPES = (int, float, bool, str, type(None))
+
+# Sprites which never change after they are created
+STATIC_TYPES = (stuff.Collider, stuff.Checkpoint, stuff.Pipe, stuff.Pole, stuff.PoleTop)
+
+# Attributes not restored: a sprite's groups are set by restoring the group
+# members, the rects of the last frame only matter to dirty rect drawing
+SKIPPED_NAMES = frozenset(('_Sprite__g', 'last_sprite_rects'))
+
+# Class for the attribute names of an object, and which of them may hold
+# something other than a number or string
+class Layout():
+    def __init__(self, index, names, values):
+        self.index = index
+        self.names = names
+        self.skipped = [i for i, name in enumerate(names) if name in SKIPPED_NAMES]
+        # None may later be an object
+        self.other = [i for i, value in enumerate(values)
+                      if (type(value) not in PLAIN_TYPES or value is None)
+                      and names[i] not in SKIPPED_NAMES]
+
+# Class taking and restoring snapshots of one level run
+class Snapshotter():
+    def __init__(self, level):
+        self.level = level
+        self.session = next(SESSIONS)
+        self.objects = []
+        self.object_indices = {}
+        self.layouts = {}
+        self.layout_list = []
+        # encoded records of the objects and groups in the last snapshot or restore
+        self.records = {}
+        self.group_records = {}
+        # the last keyframe used, with its records and group records by object index
+        self.keyframe = None
+
+    def __getstate__(self):
+        # for gamestate: the encoded records are only kept to save time
+        state = self.__dict__.copy()
+        state.update(object_indices=None, records={}, group_records={}, keyframe=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.object_indices = {id(obj): i for i, obj in enumerate(self.objects)}
+
+    def get_index(self, obj):
+        # index of obj in the object table, adding it when it is new
+        index = self.object_indices.get(id(obj))
+        if index is None:
+            index = self.object_indices[id(obj)] = len(self.objects)
+            self.objects.append(obj)
+        return index
+
+    def get_groups(self):
+        level = self.level
+        groups = [value for value in level.__dict__.values()
+                  if isinstance(value, pg.sprite.AbstractGroup)]
+        groups.extend(group for group in level.enemy_group_list if group is not None)
+        return list(dict.fromkeys(groups))
+
+    def get_state_objects(self, groups):
+        # every object whose attributes are stored, and the ones of them which
+        # may have changed since the last snapshot or restore, as dictionaries
+        # so objects are encoded, and added to the object table, in the same
+        # order in every process
+        level = self.level
+        changed = dict.fromkeys((level, level.overhead_info, level.overhead_info.flashing_coin))
+        for score in level.moving_score_list:
+            changed[score] = True
+            changed.update(dict.fromkeys(score.digit_list))
+        asleep = {}
+        waiting = set(level.enemy_group_list)
+        for group in groups:
+            if isinstance(group, spatial.SpatialGroup):
+                asleep.update(dict.fromkeys(group.sprites()))
+                changed.update(group.dynamic_sprites)
+                if level.changed_region is not None:
+                    changed.update(dict.fromkeys(group.sprites_in_rect(level.changed_region)))
+            elif group in waiting:
+                # enemies are not updated before their checkpoint moves them to enemy_group
+                asleep.update(dict.fromkeys(group.sprites()))
+            else:
+                for sprite in group.sprites():
+                    if type(sprite) in STATIC_TYPES:
+                        asleep[sprite] = True
+                    else:
+                        changed[sprite] = True
+        for obj in changed:
+            asleep.pop(obj, None)
+        return asleep, changed
+
+    def encode_object(self, obj):
+        attributes = obj.__dict__
+        names = tuple(attributes)
+        key = (type(obj), names)
+        values = list(attributes.values())
+        layout = self.layouts.get(key)
+        if layout is None:
+            layout = self.layouts[key] = Layout(len(self.layout_list), names, values)
+            self.layout_list.append(layout)
+        for i in layout.skipped:
+            values[i] = None
+        for i in layout.other:
+            value = values[i]
+            value_type = type(value)
+            if value_type is pg.Rect:
+                values[i] = [value.x, value.y, value.w, value.h]
+            elif value_type not in PLAIN_TYPES:
+                # a one item list marks an object table index
+                values[i] = [self.get_index(value)]
+        return (self.get_index(obj), marshal.dumps((layout.index, values)))
+
+    def encode_group(self, group):
+        sprites = group.sprites()
+        members = [self.get_index(sprite) for sprite in sprites]
+        if isinstance(group, spatial.SpatialGroup):
+            # spatial groups also keep the query order and the dynamic sprites
+            data = (members, [group.order[sprite] for sprite in sprites],
+                    [sprite in group.dynamic_sprites for sprite in sprites], group.next_order)
+        else:
+            data = (members,)
+        return (self.get_index(group), marshal.dumps(data))
+
+    def get_members_key(self, group):
+        # something which is the same as long as the members of group are
+        if isinstance(group, spatial.SpatialGroup):
+            return group.change_count
+        return group.sprites()
+
+    def get_group_record(self, group):
+        key = self.get_members_key(group)
+        cached = self.group_records.get(group)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        record = self.encode_group(group)
+        self.group_records[group] = (key, record)
+        return record
+
+    def take(self, keyframe=None):
+        level = self.level
+        groups = self.get_groups()
+        asleep, changed = self.get_state_objects(groups)
+        records = {obj: self.records.get(obj) for obj in asleep}
+        for obj in changed:
+            records[obj] = self.encode_object(obj)
+        for obj, record in records.items():
+            if record is None:
+                records[obj] = self.encode_object(obj)
+        self.records = records
+        level.changed_region = None
+        game_info = list(level.game_info.items())
+        scores = [self.get_index(score) for score in level.moving_score_list]
+        alphas = self.get_player_alphas()
+        group_records = [self.get_group_record(group) for group in groups]
+        if keyframe is None:
+            return marshal.dumps((VERSION, self.session, game_info, scores, alphas,
+                                  list(records.values()), group_records))
+        key_records, key_group_records = self.get_keyframe_records(keyframe)
+        records = dict(records.values())
+        return marshal.dumps((VERSION, self.session, game_info, scores, alphas,
+                              [index for index in key_records if index not in records],
+                              get_changed(key_records, records.items()),
+                              get_changed(key_group_records, group_records)))
+
+    def load(self, buffer):
+        data = marshal.loads(buffer)
+        if data[0] != VERSION or data[1] != self.session:
+            raise ValueError('the snapshot was taken from another level run')
+        return data[2:]
+
+    def get_keyframe_records(self, keyframe):
+        if self.keyframe is None or self.keyframe[0] is not keyframe:
+            records, group_records = self.load(keyframe)[3:]
+            self.keyframe = (keyframe, dict(records), dict(group_records))
+        return self.keyframe[1:]
+
+    def restore(self, buffer, keyframe=None):
+        if keyframe is None:
+            game_info, scores, alphas, records, group_records = self.load(buffer)
+        else:
+            game_info, scores, alphas, removed, changed, changed_groups = self.load(buffer)
+            key_records, key_group_records = self.get_keyframe_records(keyframe)
+            records = dict(key_records)
+            for index in removed:
+                del records[index]
+            records.update(changed)
+            records = list(records.items())
+            group_records = dict(key_group_records)
+            group_records.update(changed_groups)
+            group_records = list(group_records.items())
+        level = self.level
+        objects = self.objects
+        asleep, changed = self.get_state_objects(self.get_groups())
+        last_records = self.records
+        self.records = {}
+        for record in records:
+            obj = objects[record[0]]
+            self.records[obj] = record
+            if obj in asleep and last_records.get(obj) == record:
+                # already in the state of the snapshot
+                continue
+            layout_index, values = marshal.loads(record[1])
+            self.decode_object(obj, self.layout_list[layout_index], values)
+        for index, data in group_records:
+            group = objects[index]
+            self.restore_group(group, (index, data))
+
+        # dictionaries and lists shared with other objects are changed in place
+        level.game_info.clear()
+        level.game_info.update(game_info)
+        level.moving_score_list[:] = [objects[index] for index in scores]
+        self.restore_player_alphas(alphas)
+        level.overhead_info.restore_labels(level.game_info)
+        level.changed_region = None
+        # the whole screen is drawn again
+        level.last_viewport_x = None
+
+    def get_player_alphas(self):
+        # the player's frames are set transparent and opaque in place while it
+        # flashes, one byte for each frame
+        alphas = (image.get_alpha() for frames in self.level.player.all_images
+                  for image in frames)
+        return bytes(255 if alpha is None else alpha for alpha in alphas)
+
+    def restore_player_alphas(self, alphas):
+        images = (image for frames in self.level.player.all_images for image in frames)
+        for image, alpha in zip(images, alphas):
+            image.set_alpha(alpha)
+
+    def decode_object(self, obj, layout, values):
+        attributes = obj.__dict__
+        objects = self.objects
+        names = layout.names
+        for i in layout.other:
+            value = values[i]
+            if type(value) is list:
+                if len(value) == 1:
+                    values[i] = objects[value[0]]
+                else:
+                    rect = attributes.get(names[i])
+                    if type(rect) is pg.Rect:
+                        # keep the rect objects, other objects may share them
+                        rect.update(value)
+                        values[i] = rect
+                    else:
+                        values[i] = pg.Rect(value)
+        skipped = [(names[i], attributes[names[i]]) for i in layout.skipped
+                   if names[i] in attributes]
+        if len(attributes) != len(names) or tuple(attributes) != names:
+            # attributes added since the snapshot
+            for name in set(attributes) - set(names):
+                del attributes[name]
+        attributes.update(zip(names, values))
+        attributes.update(skipped)
+
+    def restore_group(self, group, record):
+        if self.get_group_record(group) == record:
+            return
+        data = marshal.loads(record[1])
+        sprites = [self.objects[index] for index in data[0]]
+        group.empty()
+        if isinstance(group, spatial.SpatialGroup):
+            for sprite, order, dynamic in zip(sprites, data[1], data[2]):
+                group.add_ordered(sprite, order, dynamic)
+            group.next_order = data[3]
+        else:
+            group.add(*sprites)
+        self.group_records[group] = (self.get_members_key(group), record)
+
+# Function to get the values of a snapshot, with its records decoded too
+def get_values(buffer):
+    data = list(marshal.loads(buffer))
+    for i in (-2, -1):
+        data[i] = [(index, marshal.loads(record)) for index, record in data[i]]
+    return data
+
+# Function to make the snapshot get_values() got values from, raises
+# ValueError when they can't be one
+def get_buffer(data):
+    if type(data) is not list or len(data) not in (7, 8) or data[0] != VERSION:
+        raise ValueError('not a snapshot')
+    data = list(data)
+    try:
+        for i in (-2, -1):
+            data[i] = [(int(index), marshal.dumps(values)) for index, values in data[i]]
+        # marshal only dumps numbers, strings, bytes and containers of them
+        return marshal.dumps(tuple(data))
+    except (TypeError, ValueError) as error:
+        raise ValueError('not a snapshot: %s' % error)
+
+# Function to get the (index, record) pairs which differ from the records by index of a keyframe
+def get_changed(key_records, records):
+    return [(index, record) for index, record in records if key_records.get(index) != record]
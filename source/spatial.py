@@ -0,0 +1,147 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+import pygame as pg
+from . import constants as c
+
+# Class for a sprite group with a uniform grid index over the sprite rects.
+# Sprites are indexed where they are when added, so only sprites which stay
+# within c.GRID_MARGIN of that position (ground, steps, pipes, bricks, boxes)
+# should be added normally. Moving sprites like sliders are added with
+# add_dynamic() and checked on every query.
+class SpatialGroup(pg.sprite.Group):
+    def __init__(self, *sprites, cell_size=c.GRID_CELL_SIZE, margin=c.GRID_MARGIN):
+        self.cell_size = cell_size
+        self.margin = margin
+        self.cells = {}
+        self.sprite_cells = {}
+        self.dynamic_sprites = {}
+        self.order = {}
+        self.next_order = 0
+        self.forced_order = None
+        self.adding_dynamic = False
+        self.query_count = 0
+        # number of sprites added and removed so far, e.g. to see if the members changed
+        self.change_count = 0
+        pg.sprite.Group.__init__(self, *sprites)
+
+    def add_dynamic(self, *sprites):
+        self.adding_dynamic = True
+        self.add(*sprites)
+        self.adding_dynamic = False
+
+    def add_ordered(self, sprite, order, dynamic=False):
+        '''add sprite with the given position in the group order instead of
+        after all sprites added so far, e.g. for sprites created out of order'''
+        self.forced_order = order
+        self.adding_dynamic = dynamic
+        self.add(sprite)
+        self.forced_order = None
+        self.adding_dynamic = False
+
+    def add_internal(self, sprite, layer=None):
+        pg.sprite.Group.add_internal(self, sprite, layer)
+        self.change_count += 1
+        # keep the group iteration order so queries return the same sprite
+        # as pg.sprite.spritecollideany
+        if self.forced_order is not None:
+            self.order[sprite] = self.forced_order
+        else:
+            self.order[sprite] = self.next_order
+            self.next_order += 1
+        if self.adding_dynamic:
+            self.dynamic_sprites[sprite] = True
+            return
+
+        keys = list(self.get_cell_keys(sprite.rect))
+        for key in keys:
+            self.cells.setdefault(key, {})[sprite] = True
+        self.sprite_cells[sprite] = keys
+
+    def remove_internal(self, sprite):
+        # called by group.remove() and sprite.kill(), e.g. when a brick is broken
+        pg.sprite.Group.remove_internal(self, sprite)
+        self.change_count += 1
+        del self.order[sprite]
+        if sprite in self.dynamic_sprites:
+            del self.dynamic_sprites[sprite]
+            return
+
+        for key in self.sprite_cells.pop(sprite):
+            cell = self.cells[key]
+            del cell[sprite]
+            if not cell:
+                del self.cells[key]
+
+    def get_cell_keys(self, rect):
+        size = self.cell_size
+        for cell_x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cell_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (cell_x, cell_y)
+
+    def get_candidates(self, rect):
+        '''sprites which may collide with rect'''
+        candidates = dict(self.dynamic_sprites)
+        rect = rect.inflate(self.margin * 2, self.margin * 2)
+        size = self.cell_size
+        left, right = rect.left // size, (rect.right - 1) // size
+        top, bottom = rect.top // size, (rect.bottom - 1) // size
+        if (right - left + 1) * (bottom - top + 1) > len(self.cells):
+            # a large rect, e.g. the active region: going through the cells
+            # holding sprites is quicker than looking up every cell of rect
+            for (cell_x, cell_y), cell in self.cells.items():
+                if left <= cell_x <= right and top <= cell_y <= bottom:
+                    candidates.update(cell)
+            return candidates
+        cells = self.cells
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell:
+                    candidates.update(cell)
+        return candidates
+
+    def sprites_in_rect(self, rect):
+        '''sprites colliding with rect, in group order'''
+        sprites = [sprite for sprite in self.get_candidates(rect)
+                    if rect.colliderect(sprite.rect)]
+        sprites.sort(key=self.order.__getitem__)
+        return sprites
+
+    def spritecollideany(self, sprite):
+        '''same result as pg.sprite.spritecollideany(sprite, self), without
+        checking every sprite in the group'''
+        self.query_count += 1
+        rect = sprite.rect
+        result = None
+        result_order = None
+        for other in self.get_candidates(rect):
+            if rect.colliderect(other.rect):
+                order = self.order[other]
+                if result is None or order < result_order:
+                    result = other
+                    result_order = order
+        return result
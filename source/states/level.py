@@ -24,18 +24,24 @@ SOFTWARE.
 
 __author__ = 'm0rniac'
 
-import os
-import json
+import threading
 import pygame as pg
-from .. import setup, tools
+from .. import setup, tools, spatial, mapfile, streaming, enemy_engine, observers, snapshot
+from .. import rewind
 from .. import constants as c
 from ..components import info, stuff, player, brick, box, enemy, powerup, coin
 
 # Define a class for the level state, which inherits from tools.State
 class Level(tools.State):
-    def __init__(self):
+    def __init__(self, rewind_memory=0):
         tools.State.__init__(self)
         self.player = None
+        # bytes kept for rewinding each level run, 0 for no rewinding
+        self.rewind_memory = rewind_memory
+        self.prepare_thread = None
+        self.prepared_level_num = None
+        # LevelTemplate of each level played so far, by level num
+        self.templates = {}
 
     # Function to initialize the level state
     def startup(self, current_time, persist):
@@ -45,56 +51,121 @@ class Level(tools.State):
         self.game_info[c.CURRENT_TIME] = current_time
         self.death_timer = 0
         self.castle_timer = 0
+        self.dirty_rects = None
+        # number of sprites blitted and skipped by the last draw
+        self.drawn_count = 0
+        self.culled_count = 0
+        self.activation_margin = c.ACTIVATION_MARGIN
+        self.enemy_engine = enemy_engine.EnemyEngine() if c.BATCH_ENEMIES else None
+        self.last_viewport_x = None
+        self.last_sprite_rects = []
+        # snapshots are only valid for the run they were taken from
+        self.snapshotter = None
+        # area of all active regions since the last snapshot or restore
+        self.changed_region = None
+        # game time lost by rewinding, subtracted from the current time
+        self.time_offset = 0
         
         # Initialize lists and overhead information
         self.moving_score_list = []
         self.overhead_info = info.Info(self.game_info, c.LEVEL)
         
-        # Load map data and set up background
-        self.load_map()
-        self.setup_background()
+        # Take over the map the load screen prepared, or prepare it now
+        if self.prepare_thread is not None:
+            self.prepare_thread.join()
+            self.prepare_thread = None
+        if self.prepared_level_num != self.game_info[c.LEVEL_NUM]:
+            self.prepare(self.game_info[c.LEVEL_NUM])
+        self.prepared_level_num = None
+
+        self.setup_player()
+        self.player_group = pg.sprite.Group(self.player)
+        if self.streamer is not None:
+            self.streamer.start()
+        # snapshots, and so rewinding, do not support streaming
+        self.rewinder = None
+        if self.rewind_memory and self.streamer is None:
+            self.rewinder = rewind.Rewinder(self, memory=self.rewind_memory)
+
+    def __getstate__(self):
+        '''for gamestate: the map being prepared is waited for as the thread
+        can't be saved, and the game loading the state draws the whole screen'''
+        if self.prepare_thread is not None:
+            self.prepare_thread.join()
+        state = self.__dict__.copy()
+        state['prepare_thread'] = None
+        state['last_viewport_x'] = None
+        return state
+
+    # Function to start preparing the map of a level on a worker thread, the
+    # next startup of that level waits for it and takes over the result
+    def start_prepare(self, level_num):
+        self.prepared_level_num = None
+        self.prepare_thread = threading.Thread(target=self.prepare, args=(level_num,), daemon=True)
+        self.prepare_thread.start()
+
+    # Function to load the map and create the sprites of the map, it only uses
+    # the map data so it can run while another state is being played
+    def prepare(self, level_num):
+        # Count frame cache hits and memory saved from this level on
+        tools.FRAME_CACHE.reset_stats()
+
+        # Load map data, set up background and the ground, step and pipe groups
+        # the first time the level is played, later reuse them as they never change
+        self.template = self.templates.get(level_num)
+        if self.template is None:
+            self.load_map(level_num)
+            self.setup_background()
+            if c.STREAMING:
+                # the MapStreamer adds them around the viewport
+                self.ground_group = pg.sprite.Group()
+                self.step_group = pg.sprite.Group()
+                self.pipe_group = spatial.SpatialGroup()
+            else:
+                self.ground_group = self.setup_collide(c.MAP_GROUND)
+                self.step_group = self.setup_collide(c.MAP_STEP)
+                self.setup_pipe()
+            self.template = self.templates[level_num] = LevelTemplate(self)
+        else:
+            self.template.restore(self)
         self.setup_maps()
         
-        # Set up various sprite groups for collisions and interactions
-        self.ground_group = self.setup_collide(c.MAP_GROUND)
-        self.step_group = self.setup_collide(c.MAP_STEP)
-        self.setup_pipe()
+        # Set up the sprites which move or can be destroyed
         self.setup_slider()
-        self.setup_static_coin()
-        self.setup_brick_and_box()
-        self.setup_player()
-        self.setup_enemies()
-        self.setup_checkpoints()
+        if c.STREAMING:
+            self.setup_streaming()
+        else:
+            self.streamer = None
+            self.setup_static_coin()
+            self.setup_brick_and_box()
+            self.setup_enemies()
+            self.setup_checkpoints()
         self.setup_flagpole()
         self.setup_sprite_groups()
+        self.prepared_level_num = level_num
 
-    # Function to load the map data from a JSON file
-    def load_map(self):
-        map_file = 'level_' + str(self.game_info[c.LEVEL_NUM]) + '.json'
-        file_path = os.path.join('source', 'data', 'maps', map_file)
-        f = open(file_path)
-        self.map_data = json.load(f)
-        f.close()
+    # Function to load the map data, from the compiled map file when it is up to date
+    def load_map(self, level_num):
+        self.map_data = mapfile.load_map(level_num)
     
     # Function to set up the level background
     def setup_background(self):
-        img_name = self.map_data[c.MAP_IMAGE]
-        self.background = setup.GFX[img_name]
+        img_name = self.map_data.image_name
+        # the background is scaled in strips around the viewport instead of
+        # keeping a scaled copy of the whole map, sprites are drawn straight
+        # onto the screen with the viewport as offset
+        self.background = tools.ScaledBackground(setup.GFX[img_name], c.BACKGROUND_MULTIPLER)
+        self.setup_viewport()
+
+    def setup_viewport(self):
         self.bg_rect = self.background.get_rect()
-        self.background = pg.transform.scale(self.background, 
-                                    (int(self.bg_rect.width*c.BACKGROUND_MULTIPLER),
-                                    int(self.bg_rect.height*c.BACKGROUND_MULTIPLER)))
-        self.bg_rect = self.background.get_rect()
-
-        self.level = pg.Surface((self.bg_rect.w, self.bg_rect.h)).convert()
         self.viewport = setup.SCREEN.get_rect(bottom=self.bg_rect.bottom)
 
     # Function to set up the different maps for the level
     def setup_maps(self):
-        self.map_list = []
-        if c.MAP_MAPS in self.map_data:
-            for data in self.map_data[c.MAP_MAPS]:
-                self.map_list.append((data['start_x'], data['end_x'], data['player_x'], data['player_y']))
+        self.map_list = list(self.map_data.records(c.MAP_MAPS,
+                                'start_x', 'end_x', 'player_x', 'player_y'))
+        if self.map_list:
             self.start_x, self.end_x, self.player_x, self.player_y = self.map_list[0]
         else:
             self.start_x = 0
@@ -106,6 +177,8 @@ class Level(tools.State):
     def change_map(self, index, type):
         self.start_x, self.end_x, self.player_x, self.player_y = self.map_list[index]
         self.viewport.x = self.start_x
+        if self.streamer is not None:
+            self.streamer.update(self.viewport)
         if type == c.CHECKPOINT_TYPE_MAP:
             self.player.rect.x = self.viewport.x + self.player_x
             self.player.rect.bottom = self.player_y
@@ -119,55 +192,47 @@ class Level(tools.State):
     # Function to set up collision groups for various map elements
     def setup_collide(self, name):
         group = pg.sprite.Group()
-        if name in self.map_data:
-            for data in self.map_data[name]:
-                group.add(stuff.Collider(data['x'], data['y'], 
-                        data['width'], data['height'], name))
+        for x, y, width, height in self.map_data.records(name, 'x', 'y', 'width', 'height'):
+            group.add(stuff.Collider(x, y, width, height, name))
         return group
 
     # Function to set up pipe objects on the map
     def setup_pipe(self):
-        self.pipe_group = pg.sprite.Group()
-        if c.MAP_PIPE in self.map_data:
-            for data in self.map_data[c.MAP_PIPE]:
-                self.pipe_group.add(stuff.Pipe(data['x'], data['y'],
-                    data['width'], data['height'], data['type']))
+        self.pipe_group = spatial.SpatialGroup()
+        for x, y, width, height, type in self.map_data.records(c.MAP_PIPE,
+                'x', 'y', 'width', 'height', 'type'):
+            self.pipe_group.add(stuff.Pipe(x, y, width, height, type))
 
     # Function to set up slider objects on the map
     def setup_slider(self):
         self.slider_group = pg.sprite.Group()
-        if c.MAP_SLIDER in self.map_data:
-            for data in self.map_data[c.MAP_SLIDER]:
-                if c.VELOCITY in data:
-                    vel = data[c.VELOCITY]
-                else:
-                    vel = 1
-                self.slider_group.add(stuff.Slider(data['x'], data['y'], data['num'],
-                    data['direction'], data['range_start'], data['range_end'], vel))
+        for x, y, num, direction, range_start, range_end, vel in self.map_data.records(c.MAP_SLIDER,
+                'x', 'y', 'num', 'direction', 'range_start', 'range_end', c.VELOCITY):
+            if vel is None:
+                vel = 1
+            self.slider_group.add(stuff.Slider(x, y, num,
+                direction, range_start, range_end, vel))
 
     def setup_static_coin(self):
-        self.static_coin_group = pg.sprite.Group()
-        if c.MAP_COIN in self.map_data:
-            for data in self.map_data[c.MAP_COIN]:
-                self.static_coin_group.add(coin.StaticCoin(data['x'], data['y']))
+        self.static_coin_group = spatial.SpatialGroup()
+        for x, y in self.map_data.records(c.MAP_COIN, 'x', 'y'):
+            self.static_coin_group.add(coin.StaticCoin(x, y))
 
     def setup_brick_and_box(self):
         self.coin_group = pg.sprite.Group()
         self.powerup_group = pg.sprite.Group()
-        self.brick_group = pg.sprite.Group()
+        self.brick_group = spatial.SpatialGroup()
         self.brickpiece_group = pg.sprite.Group()
 
-        if c.MAP_BRICK in self.map_data:
-            for data in self.map_data[c.MAP_BRICK]:
-                brick.create_brick(self.brick_group, data, self)
+        for data in self.map_data.items(c.MAP_BRICK):
+            brick.create_brick(self.brick_group, data, self)
         
-        self.box_group = pg.sprite.Group()
-        if c.MAP_BOX in self.map_data:
-            for data in self.map_data[c.MAP_BOX]:
-                if data['type'] == c.TYPE_COIN:
-                    self.box_group.add(box.Box(data['x'], data['y'], data['type'], self.coin_group))
-                else:
-                    self.box_group.add(box.Box(data['x'], data['y'], data['type'], self.powerup_group))
+        self.box_group = spatial.SpatialGroup()
+        for x, y, type in self.map_data.records(c.MAP_BOX, 'x', 'y', 'type'):
+            if type == c.TYPE_COIN:
+                self.box_group.add(box.Box(x, y, type, self.coin_group))
+            else:
+                self.box_group.add(box.Box(x, y, type, self.powerup_group))
     
     # Function to set up the player object
     def setup_player(self):
@@ -183,41 +248,55 @@ class Level(tools.State):
         self.viewport.x = self.player.rect.x - 110
 
     def setup_enemies(self):
-        self.enemy_group_list = []
-        index = 0
-        for data in self.map_data[c.MAP_ENEMY]:
-            group = pg.sprite.Group()
-            for item in data[str(index)]:
-                group.add(enemy.create_enemy(item, self))
-            self.enemy_group_list.append(group)
-            index += 1
+        self.enemy_group_list = [pg.sprite.Group()
+                                 for i in range(self.map_data.enemy_group_num)]
+        for item in self.map_data.items(c.MAP_ENEMY):
+            self.enemy_group_list[item[mapfile.ENEMY_GROUP]].add(enemy.create_enemy(item, self))
             
     def setup_checkpoints(self):
         self.checkpoint_group = pg.sprite.Group()
-        for data in self.map_data[c.MAP_CHECKPOINT]:
-            if c.ENEMY_GROUPID in data:
-                enemy_groupid = data[c.ENEMY_GROUPID]
-            else:
+        for x, y, width, height, type, enemy_groupid, map_index in self.map_data.records(
+                c.MAP_CHECKPOINT, 'x', 'y', 'width', 'height', 'type', c.ENEMY_GROUPID, c.MAP_INDEX):
+            if enemy_groupid is None:
                 enemy_groupid = 0
-            if c.MAP_INDEX in data:
-                map_index = data[c.MAP_INDEX]
-            else:
+            if map_index is None:
                 map_index = 0
-            self.checkpoint_group.add(stuff.Checkpoint(data['x'], data['y'], data['width'], 
-                data['height'], data['type'], enemy_groupid, map_index))
+            self.checkpoint_group.add(stuff.Checkpoint(x, y, width, 
+                height, type, enemy_groupid, map_index))
     
+    # Function to set up empty groups for the map sprites a MapStreamer creates
+    # near the viewport, enemy groups are created when their checkpoint is reached
+    def setup_streaming(self):
+        for group in (self.ground_group, self.step_group, self.pipe_group):
+            group.empty()
+        self.static_coin_group = spatial.SpatialGroup()
+        self.coin_group = pg.sprite.Group()
+        self.powerup_group = pg.sprite.Group()
+        self.brick_group = spatial.SpatialGroup()
+        self.brickpiece_group = pg.sprite.Group()
+        self.box_group = spatial.SpatialGroup()
+        self.checkpoint_group = pg.sprite.Group()
+        self.enemy_group_list = [None] * self.map_data.enemy_group_num
+        self.streamer = streaming.MapStreamer(self)
+
+    def get_enemy_group(self, enemy_groupid):
+        group = self.enemy_group_list[enemy_groupid]
+        if group is None:
+            group = self.streamer.create_enemy_group(enemy_groupid)
+            self.enemy_group_list[enemy_groupid] = group
+        return group
+
     def setup_flagpole(self):
         self.flagpole_group = pg.sprite.Group()
-        if c.MAP_FLAGPOLE in self.map_data:
-            for data in self.map_data[c.MAP_FLAGPOLE]:
-                if data['type'] == c.FLAGPOLE_TYPE_FLAG:
-                    sprite = stuff.Flag(data['x'], data['y'])
-                    self.flag = sprite
-                elif data['type'] == c.FLAGPOLE_TYPE_POLE:
-                    sprite = stuff.Pole(data['x'], data['y'])
-                else:
-                    sprite = stuff.PoleTop(data['x'], data['y'])
-                self.flagpole_group.add(sprite)
+        for x, y, type in self.map_data.records(c.MAP_FLAGPOLE, 'x', 'y', 'type'):
+            if type == c.FLAGPOLE_TYPE_FLAG:
+                sprite = stuff.Flag(x, y)
+                self.flag = sprite
+            elif type == c.FLAGPOLE_TYPE_POLE:
+                sprite = stuff.Pole(x, y)
+            else:
+                sprite = stuff.PoleTop(x, y)
+            self.flagpole_group.add(sprite)
         
         
     def setup_sprite_groups(self):
@@ -225,14 +304,35 @@ class Level(tools.State):
         self.enemy_group = pg.sprite.Group()
         self.shell_group = pg.sprite.Group()
         
-        self.ground_step_pipe_group = pg.sprite.Group(self.ground_group,
-                        self.pipe_group, self.step_group, self.slider_group)
-        self.player_group = pg.sprite.Group(self.player)
+        # both start with the ground, pipe and step sprites of the template
+        self.ground_step_pipe_group, self.solid_group = self.template.get_static_groups()
+        self.ground_step_pipe_group.add_dynamic(self.slider_group)
+        # everything moving sprites can stand on or bump into, in the same order as
+        # a Group(ground_step_pipe_group, brick_group, box_group) would have.
+        # Broken bricks leave it through sprite.kill(), new boxes are added in check_checkpoints
+        self.solid_group.add_dynamic(self.slider_group)
+        self.solid_group.add(self.brick_group, self.box_group)
+        self.saved_group_allocations = 0
         
     def update(self, surface, keys, current_time):
-        self.game_info[c.CURRENT_TIME] = self.current_time = current_time
-        self.handle_states(keys)
-        self.draw(surface)
+        if self.rewinder is not None and keys[tools.keybinding['rewind']]:
+            self.rewinder.step_back()
+            # the game time goes on from the frame rewound to
+            self.time_offset = current_time - self.current_time
+        else:
+            current_time -= self.time_offset
+            self.game_info[c.CURRENT_TIME] = self.current_time = current_time
+            self.handle_states(keys)
+            if self.rewinder is not None:
+                self.rewinder.record()
+        if self.streamer is not None:
+            self.streamer.update(self.viewport)
+        # each solid_group query used to build a new combined Group of all solid sprites
+        self.saved_group_allocations = self.solid_group.query_count
+        self.solid_group.query_count = 0
+        # surface is None when simulating without drawing
+        if surface is not None:
+            self.draw(surface)
     
     def handle_states(self, keys):
         self.update_all_sprites(keys)
@@ -261,12 +361,13 @@ class Level(tools.State):
             self.flagpole_group.update()
             self.check_checkpoints()
             self.slider_group.update()
-            self.static_coin_group.update(self.game_info)
-            self.enemy_group.update(self.game_info, self)
-            self.shell_group.update(self.game_info, self)
-            self.brick_group.update()
-            self.box_group.update(self.game_info)
-            self.powerup_group.update(self.game_info, self)
+            self.update_active_region()
+            self.update_active(self.static_coin_group, self.game_info)
+            self.update_enemies()
+            self.update_active(self.shell_group, self.game_info, self)
+            self.update_active(self.brick_group)
+            self.update_active(self.box_group, self.game_info)
+            self.update_active(self.powerup_group, self.game_info, self)
             self.coin_group.update(self.game_info)
             self.brickpiece_group.update()
             self.dying_group.update(self.game_info, self)
@@ -277,12 +378,62 @@ class Level(tools.State):
             for score in self.moving_score_list:
                 score.update(self.moving_score_list)
     
+    def update_active_region(self):
+        '''sprites outside the viewport plus activation_margin on either side are asleep'''
+        self.active_region = self.viewport.inflate(self.activation_margin * 2, 0)
+        if self.changed_region is None:
+            self.changed_region = self.active_region.copy()
+        else:
+            self.changed_region.union_ip(self.active_region)
+
+    def get_active(self, group):
+        '''the sprites of group which are awake'''
+        if isinstance(group, spatial.SpatialGroup):
+            return group.sprites_in_rect(self.active_region)
+        left, right = self.active_region.left, self.active_region.right
+        return [sprite for sprite in group.sprites()
+                if (sprite.rect.right >= left and sprite.rect.left <= right)
+                or getattr(sprite, 'always_active', False)]
+
+    def update_active(self, group, *args):
+        '''update the sprites of group which are awake, like group.update(*args)'''
+        for sprite in self.get_active(group):
+            sprite.update(*args)
+
+    def update_enemies(self):
+        if self.enemy_engine is not None:
+            self.enemy_engine.update(self.get_active(self.enemy_group), self.game_info, self)
+        else:
+            self.update_active(self.enemy_group, self.game_info, self)
+
+    def snapshot(self, keyframe=None):
+        '''the state of this level run as a buffer for restore(), see snapshot.Snapshotter,
+        only holding what differs from the snapshot keyframe if given'''
+        if self.streamer is not None:
+            raise ValueError('snapshots do not support map streaming')
+        if self.snapshotter is None:
+            self.snapshotter = snapshot.Snapshotter(self)
+        return self.snapshotter.take(keyframe)
+
+    def restore(self, state, keyframe=None):
+        '''set the level back to a snapshot() taken since the last startup, and
+        taken with the same keyframe'''
+        if self.snapshotter is None:
+            raise ValueError('the snapshot was taken from another level run')
+        self.snapshotter.restore(state, keyframe)
+
+    def get_tile_window(self):
+        '''uint8 tile grid of the viewport, see observers.TileGrid'''
+        if self.template.tile_grid is None:
+            self.template.tile_grid = observers.TileGrid(self.map_data)
+        return self.template.tile_grid.get_window(self)
+
     def check_checkpoints(self):
         checkpoint = pg.sprite.spritecollideany(self.player, self.checkpoint_group)
         
         if checkpoint:
             if checkpoint.type == c.CHECKPOINT_TYPE_ENEMY:
-                group = self.enemy_group_list[checkpoint.enemy_groupid]
+                group = self.get_enemy_group(checkpoint.enemy_groupid)
                 self.enemy_group.add(group)
             elif checkpoint.type == c.CHECKPOINT_TYPE_FLAG:
                 self.player.state = c.FLAGPOLE
@@ -301,6 +452,7 @@ class Level(tools.State):
                                 c.TYPE_LIFEMUSHROOM, self.powerup_group)
                 mushroom_box.start_bump(self.moving_score_list)
                 self.box_group.add(mushroom_box)
+                self.solid_group.add(mushroom_box)
                 self.player.y_vel = 7
                 self.player.rect.y = mushroom_box.rect.bottom
                 self.player.state = c.FALL
@@ -341,13 +493,13 @@ class Level(tools.State):
             self.check_player_y_collisions()
     
     def check_player_x_collisions(self):
-        ground_step_pipe = pg.sprite.spritecollideany(self.player, self.ground_step_pipe_group)
-        brick = pg.sprite.spritecollideany(self.player, self.brick_group)
-        box = pg.sprite.spritecollideany(self.player, self.box_group)
+        ground_step_pipe = self.ground_step_pipe_group.spritecollideany(self.player)
+        brick = self.brick_group.spritecollideany(self.player)
+        box = self.box_group.spritecollideany(self.player)
         enemy = pg.sprite.spritecollideany(self.player, self.enemy_group)
         shell = pg.sprite.spritecollideany(self.player, self.shell_group)
         powerup = pg.sprite.spritecollideany(self.player, self.powerup_group)
-        coin = pg.sprite.spritecollideany(self.player, self.static_coin_group)
+        coin = self.static_coin_group.spritecollideany(self.player)
 
         if box:
             self.adjust_player_for_x_collisions(box)
@@ -434,14 +586,14 @@ class Level(tools.State):
         self.player.x_vel = 0
 
     def check_player_y_collisions(self):
-        ground_step_pipe = pg.sprite.spritecollideany(self.player, self.ground_step_pipe_group)
+        ground_step_pipe = self.ground_step_pipe_group.spritecollideany(self.player)
         enemy = pg.sprite.spritecollideany(self.player, self.enemy_group)
         shell = pg.sprite.spritecollideany(self.player, self.shell_group)
 
         # decrease runtime delay: when player is on the ground, don't check brick and box
         if self.player.rect.bottom < c.GROUND_HEIGHT:
-            brick = pg.sprite.spritecollideany(self.player, self.brick_group)
-            box = pg.sprite.spritecollideany(self.player, self.box_group)
+            brick = self.brick_group.spritecollideany(self.player)
+            box = self.box_group.spritecollideany(self.player)
             brick, box = self.prevent_collision_conflict(brick, box)
         else:
             brick, box = False, False
@@ -558,10 +710,8 @@ class Level(tools.State):
 
     def check_is_falling(self, sprite):
         sprite.rect.y += 1
-        check_group = pg.sprite.Group(self.ground_step_pipe_group,
-                            self.brick_group, self.box_group)
         
-        if pg.sprite.spritecollideany(sprite, check_group) is None:
+        if self.solid_group.spritecollideany(sprite) is None:
             if (sprite.state == c.WALK_AUTO or
                 sprite.state == c.END_OF_LEVEL_FALL):
                 sprite.state = c.END_OF_LEVEL_FALL
@@ -625,25 +775,119 @@ class Level(tools.State):
         self.moving_score_list.append(stuff.Score(x, y, score))
 
     def draw(self, surface):
-        self.level.blit(self.background, self.viewport, self.viewport)
-        self.powerup_group.draw(self.level)
-        self.brick_group.draw(self.level)
-        self.box_group.draw(self.level)
-        self.coin_group.draw(self.level)
-        self.dying_group.draw(self.level)
-        self.brickpiece_group.draw(self.level)
-        self.flagpole_group.draw(self.level)
-        self.shell_group.draw(self.level)
-        self.enemy_group.draw(self.level)
-        self.player_group.draw(self.level)
-        self.static_coin_group.draw(self.level)
-        self.slider_group.draw(self.level)
-        self.pipe_group.draw(self.level)
-        for score in self.moving_score_list:
-            score.draw(self.level)
-        if c.DEBUG:
-            self.ground_step_pipe_group.draw(self.level)
-            self.checkpoint_group.draw(self.level)
+        if (c.DIRTY_RECT_MODE and not c.DEBUG and
+            self.last_viewport_x == self.viewport.x):
+            self.draw_dirty(surface)
+        else:
+            self.draw_full(surface)
+        self.last_viewport_x = self.viewport.x
 
-        surface.blit(self.level, (0,0), self.viewport)
+    def draw_full(self, surface):
+        self.background.draw(surface, self.viewport)
+        self.draw_sprites(surface)
         self.overhead_info.draw(surface)
+        self.dirty_rects = None
+        if c.DIRTY_RECT_MODE:
+            self.last_sprite_rects = self.get_sprite_rects()
+
+    def draw_dirty(self, surface):
+        '''camera is still: only redraw the areas covered by sprites in this or the last frame'''
+        sprite_rects = self.get_sprite_rects()
+        world_rects = sprite_rects + self.last_sprite_rects
+        self.last_sprite_rects = sprite_rects
+
+        self.dirty_rects = [pg.Rect(c.INFO_RECT)]
+        for rect in world_rects:
+            self.dirty_rects.append(rect.move(-self.viewport.x, -self.viewport.y))
+        for rect in self.dirty_rects:
+            self.background.draw(surface, rect.move(self.viewport.topleft), rect.topleft)
+        self.draw_sprites(surface)
+        self.overhead_info.draw(surface)
+
+    def draw_group(self, surface, group):
+        '''blit the sprites of group which are in the viewport to their screen position'''
+        if isinstance(group, spatial.SpatialGroup):
+            sprites = group.sprites_in_rect(self.viewport)
+        else:
+            sprites = [sprite for sprite in group
+                        if self.viewport.colliderect(sprite.image.get_rect(topleft=sprite.rect.topleft))]
+        x, y = self.viewport.topleft
+        surface.blits([(sprite.image, sprite.rect.move(-x, -y)) for sprite in sprites], False)
+        self.drawn_count += len(sprites)
+        self.culled_count += len(group) - len(sprites)
+
+    def get_sprite_rects(self):
+        '''world rects of all sprites in the viewport which may change between frames'''
+        rects = []
+        for group in (self.powerup_group, self.brick_group, self.box_group,
+                    self.coin_group, self.dying_group, self.brickpiece_group,
+                    self.flagpole_group, self.shell_group, self.enemy_group,
+                    self.player_group, self.static_coin_group, self.slider_group):
+            for sprite in group:
+                # the image can be larger than the rect, use the area actually blitted
+                rect = sprite.image.get_rect(topleft=sprite.rect.topleft)
+                if rect.colliderect(self.viewport):
+                    rects.append(rect.clip(self.viewport))
+        for score in self.moving_score_list:
+            for digit in score.digit_list:
+                rect = digit.image.get_rect(topleft=digit.rect.topleft)
+                if rect.colliderect(self.viewport):
+                    rects.append(rect.clip(self.viewport))
+        return rects
+
+    def draw_sprites(self, surface):
+        self.drawn_count = 0
+        self.culled_count = 0
+        self.draw_group(surface, self.powerup_group)
+        self.draw_group(surface, self.brick_group)
+        self.draw_group(surface, self.box_group)
+        self.draw_group(surface, self.coin_group)
+        self.draw_group(surface, self.dying_group)
+        self.draw_group(surface, self.brickpiece_group)
+        self.draw_group(surface, self.flagpole_group)
+        self.draw_group(surface, self.shell_group)
+        self.draw_group(surface, self.enemy_group)
+        self.draw_group(surface, self.player_group)
+        self.draw_group(surface, self.static_coin_group)
+        self.draw_group(surface, self.slider_group)
+        self.draw_group(surface, self.pipe_group)
+        for score in self.moving_score_list:
+            score.draw(surface, self.viewport.topleft)
+        if c.DEBUG:
+            self.draw_group(surface, self.ground_step_pipe_group)
+            self.draw_group(surface, self.checkpoint_group)
+
+# Class holding the parts of a level which never change while it is played: the
+# map data, the background and the ground, step and pipe sprites with their
+# spatial index. Playing the level again, e.g. after a death, reuses them and
+# only creates the sprites which move or can be destroyed.
+class LevelTemplate():
+    def __init__(self, level):
+        self.map_data = level.map_data
+        # built when the first tile grid observation is asked for
+        self.tile_grid = None
+        self.background = level.background
+        self.ground_group = level.ground_group
+        self.step_group = level.step_group
+        self.pipe_group = level.pipe_group
+        self.ground_step_pipe_group = spatial.SpatialGroup(self.ground_group,
+                        self.pipe_group, self.step_group)
+        self.solid_group = spatial.SpatialGroup(self.ground_group,
+                        self.pipe_group, self.step_group)
+        self.static_sprites = set(self.solid_group.sprites())
+
+    def restore(self, level):
+        level.map_data = self.map_data
+        level.background = self.background
+        level.setup_viewport()
+        level.ground_group = self.ground_group
+        level.step_group = self.step_group
+        level.pipe_group = self.pipe_group
+
+    def get_static_groups(self):
+        # ground_step_pipe_group and solid_group with the sprites a previous play
+        # of the level added to them removed again
+        for group in (self.ground_step_pipe_group, self.solid_group):
+            group.remove([sprite for sprite in group.sprites()
+                          if sprite not in self.static_sprites])
+        return self.ground_step_pipe_group, self.solid_group
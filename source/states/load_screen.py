@@ -29,9 +29,11 @@ from .. import constants as c
 from ..components import info
 
 class LoadScreen(tools.State):
-    def __init__(self):
+    def __init__(self, level=None):
         super().__init__()
         self.time_list = [2400, 2600, 2635]
+        # Level state whose map is prepared while the load screen is shown
+        self.level = level
         
     def startup(self, current_time, persist):
         # Initialize the state with necessary variables
@@ -43,6 +45,9 @@ class LoadScreen(tools.State):
         # Set up the overhead info for displaying game information
         info_state = self.set_info_state()
         self.overhead_info = info.Info(self.game_info, info_state)
+
+        if self.next == c.LEVEL and self.level is not None:
+            self.level.start_prepare(self.game_info[c.LEVEL_NUM])
     
     def set_next_state(self):
         # Return the next state after LoadScreen
@@ -57,7 +62,8 @@ class LoadScreen(tools.State):
         if (current_time - self.start_time) < self.time_list[0]:
             self.draw_load_screen(surface, c.BLACK)
             self.overhead_info.update(self.game_info)
-            self.overhead_info.draw(surface)
+            if surface is not None:
+                self.overhead_info.draw(surface)
         elif (current_time - self.start_time) < self.time_list[1]:
             self.draw_load_screen(surface, c.BLACK)
         elif (current_time - self.start_time) < self.time_list[2]:
@@ -67,6 +73,8 @@ class LoadScreen(tools.State):
 
     def draw_load_screen(self, surface, color):
         # Helper function to fill the surface with a specific color
+        if surface is None:
+            return
         surface.fill(color)
 
 class GameOver(LoadScreen):
@@ -59,17 +59,11 @@ class Menu(tools.State):
 
     def setup_background(self):
         # Set up the main menu background
-        self.background = setup.GFX['level_1']
-        self.background_rect = self.background.get_rect()
-        self.background = pg.transform.scale(
-            self.background,
-            (int(self.background_rect.width * c.BACKGROUND_MULTIPLER),
-            int(self.background_rect.height * c.BACKGROUND_MULTIPLER))
-        )
+        self.background = tools.ScaledBackground(setup.GFX['level_1'], c.BACKGROUND_MULTIPLER)
 
         self.viewport = setup.SCREEN.get_rect(bottom=setup.SCREEN_RECT.bottom)
         self.image_dict = {}
-        image = tools.get_image(setup.GFX['title_screen'], 1, 60, 176, 88, (255, 0, 220), c.SIZE_MULTIPLIER)
+        image = tools.get_frame(setup.GFX['title_screen'], 1, 60, 176, 88, (255, 0, 220), c.SIZE_MULTIPLIER)
         rect = image.get_rect()
         rect.x, rect.y = (170, 100)
         self.image_dict['GAME_NAME_BOX'] = (image, rect)
@@ -79,7 +73,7 @@ class Menu(tools.State):
         self.player_list = []
         player_rect_info = [(178, 32, 12, 16), (178, 128, 12, 16)]
         for rect in player_rect_info:
-            image = tools.get_image(setup.GFX['mario_bros'], *rect, c.BLACK, 2.9)
+            image = tools.get_frame(setup.GFX['mario_bros'], *rect, c.BLACK, 2.9)
             rect = image.get_rect()
             rect.x, rect.bottom = 110, c.GROUND_HEIGHT
             self.player_list.append((image, rect))
@@ -103,7 +97,10 @@ class Menu(tools.State):
         self.update_cursor(keys)
         self.overhead_info.update(self.game_info)
 
-        surface.blit(self.background, self.viewport, self.viewport)
+        # surface is None when playing without drawing
+        if surface is None:
+            return
+        self.background.draw(surface, self.viewport, self.viewport.topleft)
         surface.blit(self.image_dict['GAME_NAME_BOX'][0], self.image_dict['GAME_NAME_BOX'][1])
         surface.blit(self.player_image, self.player_rect)
         surface.blit(self.cursor.image, self.cursor.rect)
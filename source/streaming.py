@@ -0,0 +1,208 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+import pygame as pg
+from . import constants as c
+from . import mapfile
+from .components import stuff, brick, box, coin, enemy
+
+# Kinds of map entities which are streamed, the index of a kind is its rank in
+# the order of the spatial groups: a Group(ground, pipe, step, slider, brick, box)
+KINDS = (c.MAP_GROUND, c.MAP_PIPE, c.MAP_STEP, c.MAP_SLIDER, c.MAP_BRICK,
+         c.MAP_BOX, c.MAP_COIN, c.MAP_CHECKPOINT)
+RANKS = {kind: rank for rank, kind in enumerate(KINDS)}
+# Order of sprites added to the spatial groups after the map entities
+LATER_ORDER = len(KINDS) << 32
+
+# Function to get the position of a map sprite in the order of the spatial groups
+def get_order(kind, index, sub_index=0):
+    return (RANKS[kind] << 32) | (index << 8) | sub_index
+
+# Class creating the map entities near the viewport and releasing those the
+# viewport has moved away from, so long levels take memory and startup time
+# for the part around the viewport only. The map is split into chunk_width
+# wide chunks, the entities of each chunk within distance of the viewport exist.
+# Entities destroyed while they existed (collected coins, broken bricks, reached
+# checkpoints) are not created again, and bricks and boxes which were bumped
+# are kept until the level ends.
+class MapStreamer():
+    def __init__(self, level, chunk_width=c.STREAM_CHUNK_WIDTH, distance=c.STREAM_DISTANCE):
+        self.level = level
+        self.chunk_width = chunk_width
+        self.distance = distance
+        self.records = {}
+        self.chunks = {}
+        self.sprites = {}
+        self.removed = set()
+        self.window = None
+        self.created_count = 0
+        self.released_count = 0
+
+        map_data = level.map_data
+        for kind in (c.MAP_GROUND, c.MAP_STEP):
+            self.add_records(kind, map_data.records(kind, 'x', 'y', 'width', 'height'))
+        self.add_records(c.MAP_PIPE, map_data.records(c.MAP_PIPE,
+                            'x', 'y', 'width', 'height', 'type'))
+        self.add_records(c.MAP_COIN, map_data.records(c.MAP_COIN, 'x', 'y'))
+        self.add_records(c.MAP_BRICK, map_data.items(c.MAP_BRICK))
+        self.add_records(c.MAP_BOX, map_data.records(c.MAP_BOX, 'x', 'y', 'type'))
+        self.add_records(c.MAP_CHECKPOINT, map_data.records(c.MAP_CHECKPOINT,
+                            'x', 'y', 'width', 'height', 'type', c.ENEMY_GROUPID, c.MAP_INDEX))
+
+        self.enemy_items = [[] for i in range(map_data.enemy_group_num)]
+        for item in map_data.items(c.MAP_ENEMY):
+            self.enemy_items[item[mapfile.ENEMY_GROUP]].append(item)
+
+    def add_records(self, kind, records):
+        rank = RANKS[kind]
+        for index, record in enumerate(records):
+            key = (rank, index)
+            self.records[key] = record
+            left, right = self.get_extent(kind, record)
+            for chunk in range(left // self.chunk_width, right // self.chunk_width + 1):
+                self.chunks.setdefault(chunk, []).append(key)
+
+    def get_extent(self, kind, record):
+        # left and right x of the sprites of a record
+        if kind == c.MAP_BRICK:
+            width = c.TILE_SIZE
+            if c.BRICK_NUM in record and record['direction'] != c.VERTICAL:
+                width *= record[c.BRICK_NUM]
+            return record['x'], record['x'] + width
+        elif kind in (c.MAP_COIN, c.MAP_BOX):
+            return record[0], record[0] + c.TILE_SIZE
+        return record[0], record[0] + record[2]
+
+    def start(self):
+        # Give the sliders, which the level created up front, their place in the group order
+        for group in (self.level.ground_step_pipe_group, self.level.solid_group):
+            group.remove(self.level.slider_group)
+            for index, slider in enumerate(self.level.slider_group):
+                group.add_ordered(slider, get_order(c.MAP_SLIDER, index), dynamic=True)
+            group.next_order = LATER_ORDER
+        self.update(self.level.viewport)
+
+    def update(self, viewport):
+        first = (viewport.left - self.distance) // self.chunk_width
+        last = (viewport.right + self.distance) // self.chunk_width
+        if self.window == (first, last):
+            return
+        self.window = (first, last)
+
+        keys = set()
+        for chunk in range(first, last + 1):
+            keys.update(self.chunks.get(chunk, ()))
+        for key in [key for key in self.sprites if key not in keys]:
+            self.release(key)
+        for key in sorted(keys):
+            if key not in self.sprites:
+                self.create(key)
+
+    def create(self, key):
+        rank, index = key
+        kind = KINDS[rank]
+        record = self.records[key]
+        level = self.level
+        if kind in (c.MAP_GROUND, c.MAP_STEP):
+            sprites = [stuff.Collider(*record, kind)]
+        elif kind == c.MAP_PIPE:
+            sprites = [stuff.Pipe(*record)]
+        elif kind == c.MAP_COIN:
+            sprites = [coin.StaticCoin(*record)]
+        elif kind == c.MAP_BRICK:
+            group = pg.sprite.Group()
+            brick.create_brick(group, record, level)
+            sprites = group.sprites()
+            group.empty()
+        elif kind == c.MAP_BOX:
+            x, y, type = record
+            group = level.coin_group if type == c.TYPE_COIN else level.powerup_group
+            sprites = [box.Box(x, y, type, group)]
+        else:
+            x, y, width, height, type, enemy_groupid, map_index = record
+            sprites = [stuff.Checkpoint(x, y, width, height, type,
+                        enemy_groupid or 0, map_index or 0)]
+
+        # (sprite, coin_num when created) or None for sprites destroyed before
+        entries = []
+        for sub_index, sprite in enumerate(sprites):
+            if key + (sub_index,) in self.removed:
+                entries.append(None)
+                continue
+            self.add_sprite(kind, sprite, get_order(kind, index, sub_index))
+            entries.append((sprite, getattr(sprite, 'coin_num', 0)))
+            self.created_count += 1
+        self.sprites[key] = entries
+
+    def add_sprite(self, kind, sprite, order):
+        level = self.level
+        if kind in (c.MAP_GROUND, c.MAP_STEP, c.MAP_PIPE):
+            if kind == c.MAP_GROUND:
+                level.ground_group.add(sprite)
+            elif kind == c.MAP_STEP:
+                level.step_group.add(sprite)
+            else:
+                level.pipe_group.add_ordered(sprite, order)
+            level.ground_step_pipe_group.add_ordered(sprite, order)
+            level.solid_group.add_ordered(sprite, order)
+        elif kind == c.MAP_BRICK:
+            level.brick_group.add_ordered(sprite, order)
+            level.solid_group.add_ordered(sprite, order)
+        elif kind == c.MAP_BOX:
+            level.box_group.add_ordered(sprite, order)
+            level.solid_group.add_ordered(sprite, order)
+        elif kind == c.MAP_COIN:
+            level.static_coin_group.add_ordered(sprite, order)
+        else:
+            level.checkpoint_group.add(sprite)
+
+    def release(self, key):
+        entries = self.sprites[key]
+        for sub_index, entry in enumerate(entries):
+            if entry is None:
+                continue
+            sprite, coin_num = entry
+            if not sprite.alive():
+                self.removed.add(key + (sub_index,))
+            elif (getattr(sprite, 'state', c.RESTING) != c.RESTING or
+                    getattr(sprite, 'coin_num', 0) != coin_num):
+                # bumped, keep it as it is
+                return
+        for entry in entries:
+            if entry is not None:
+                entry[0].kill()
+                self.released_count += 1
+        del self.sprites[key]
+
+    def create_enemy_group(self, enemy_groupid):
+        group = pg.sprite.Group()
+        for item in self.enemy_items[enemy_groupid]:
+            group.add(enemy.create_enemy(item, self.level))
+        return group
+
+    def get_sprite_num(self):
+        # number of map sprites which exist now
+        return sum(entry is not None for entries in self.sprites.values() for entry in entries)
@@ -25,6 +25,8 @@ SOFTWARE.
 __author__ = 'm0rniac'
 
 import os
+import zlib
+import threading
 import pygame as pg
 from abc import ABC, abstractmethod
 
@@ -34,7 +36,8 @@ keybinding = {
     'jump': pg.K_SPACE,
     'left': pg.K_LEFT,
     'right': pg.K_RIGHT,
-    'down': pg.K_DOWN
+    'down': pg.K_DOWN,
+    'rewind': pg.K_r
 }
 
 # Class representing a State
@@ -46,6 +49,8 @@ class State():
         self.done = False
         self.next = None
         self.persist = {}
+        # Screen rects changed by the last update, None means the whole screen
+        self.dirty_rects = None
 
     @abstractmethod
     def startup(self, current_time, persist):
@@ -60,13 +65,56 @@ class State():
     def update(self, surface, keys, current_time):
         '''Abstract method to be overridden in child classes'''
 
+# Class representing a key state supplied by code instead of the keyboard,
+# it can be used wherever the result of pg.key.get_pressed() is expected
+class KeyState():
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+# Class providing the game time from the wall clock, ticking caps the loop to the fps
+class RealTimeClock():
+    def __init__(self):
+        self.clock = pg.time.Clock()
+
+    def get_ticks(self):
+        return pg.time.get_ticks()
+
+    def tick(self, fps):
+        return self.clock.tick(fps)
+
+# Class providing a virtual game time which advances a fixed number of
+# milliseconds per tick, ticking never waits so the loop runs uncapped
+class VirtualClock():
+    def __init__(self, ms_per_tick=16):
+        self.ms_per_tick = ms_per_tick
+        self.ticks = 0
+
+    def get_ticks(self):
+        return self.ticks
+
+    def tick(self, fps=None):
+        self.ticks += self.ms_per_tick
+        return self.ms_per_tick
+
 # Class representing the Control for game states
 class Control():
-    def __init__(self):
+    def __init__(self, clock=None, recorder=None, playback=None, render=True):
         # Control variables
         self.screen = pg.display.get_surface()
         self.done = False
-        self.clock = pg.time.Clock()
+        # Time source for all game timers, the wall clock unless a VirtualClock is given
+        self.clock = clock if clock is not None else RealTimeClock()
+        # a replay.Recorder logs the time and keys of every tick, a replay.Playback
+        # supplies them instead of the wall clock and the keyboard
+        self.recorder = recorder
+        self.playback = playback
+        if playback is not None:
+            self.clock = playback
+        # states are updated without drawing when render is False
+        self.render = render
         self.fps = 60
         self.current_time = 0.0
         self.keys = pg.key.get_pressed()
@@ -82,10 +130,12 @@ class Control():
 
     def update(self):
         # Update current game state
-        self.current_time = pg.time.get_ticks()
+        self.current_time = self.clock.get_ticks()
+        if self.recorder is not None:
+            self.recorder.record(self.current_time, self.keys)
         if self.state.done:
             self.flip_state()
-        self.state.update(self.screen, self.keys, self.current_time)
+        self.state.update(self.screen if self.render else None, self.keys, self.current_time)
 
     def flip_state(self):
         # Switch to the next game state
@@ -103,14 +153,46 @@ class Control():
                 self.keys = pg.key.get_pressed()
             elif event.type == pg.KEYUP:
                 self.keys = pg.key.get_pressed()
+        if self.playback is not None:
+            # the recorded keys are pressed, the game ends with the recording
+            if self.playback.done:
+                self.done = True
+            else:
+                self.keys = self.playback.get_keys()
+
+    def get_game_info(self):
+        # Game info shared by all states: score, coins, lives, level...
+        return self.state.persist
+
+    def step(self):
+        # Run one tick of the main loop
+        self.event_loop()
+        if self.done:
+            return
+        self.update()
+        if self.render:
+            if self.state.dirty_rects is None:
+                pg.display.update()
+            else:
+                pg.display.update(self.state.dirty_rects)
+        self.clock.tick(self.fps)
 
     def main(self):
         # Main game loop
         while not self.done:
-            self.event_loop()
-            self.update()
-            pg.display.update()
-            self.clock.tick(self.fps)
+            self.step()
+        if self.recorder is not None:
+            self.recorder.save(self.get_game_info())
+
+# Function to decompress zlib data read from a file, making at most max_size
+# bytes, so a small crafted file can't take all the memory
+def decompress(data, max_size):
+    decompressor = zlib.decompressobj()
+    # a max_length of 0 would be no limit
+    result = decompressor.decompress(data, max_size + 1)
+    if not decompressor.eof or len(result) > max_size:
+        raise ValueError('compressed data truncated or larger than %d bytes' % max_size)
+    return result
 
 # Function to get an image from a sprite sheet
 def get_image(sheet, x, y, width, height, colorkey, scale):
@@ -122,12 +204,224 @@ def get_image(sheet, x, y, width, height, colorkey, scale):
     image = pg.transform.scale(image, (int(rect.width*scale), int(rect.height*scale)))
     return image
 
-# Function to load all graphics from a specified directory
-def load_all_gfx(directory, colorkey=(255, 0, 255), accept=('.png', '.jpg', '.bmp', '.gif')):
+# Class caching sliced, scaled and flipped frames so identical sprites share
+# surfaces. A level's map is prepared on a worker thread while the load screen
+# is drawn, so every method holds the cache's lock.
+class FrameCache():
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.frames = {}
+        self.sources = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_cached = 0
+        self.bytes_saved = 0
+
+    def get_image(self, sheet, x, y, width, height, colorkey, scale, flip_x=False, flip_y=False):
+        # Frames are shared between sprites, so callers must not draw on or
+        # otherwise modify the returned surface
+        if colorkey is not None:
+            colorkey = tuple(colorkey)
+        key = (sheet, (x, y, width, height), colorkey, scale, (flip_x, flip_y))
+        with self.lock:
+            image = self.frames.get(key)
+            if image is not None:
+                self.hits += 1
+                self.bytes_saved += surface_bytes(image)
+                return image
+
+            self.misses += 1
+            if flip_x or flip_y:
+                # the unflipped frame is cached too, without counting it as a lookup
+                image = self.lookup(sheet, x, y, width, height, colorkey, scale)
+                image = pg.transform.flip(image, flip_x, flip_y)
+            else:
+                image = get_image(sheet, x, y, width, height, colorkey, scale)
+            self.add_image(key, image)
+            return image
+
+    def lookup(self, sheet, x, y, width, height, colorkey, scale):
+        # Get an unflipped frame, making it on a miss, leaving the counters alone
+        key = (sheet, (x, y, width, height), colorkey, scale, (False, False))
+        with self.lock:
+            image = self.frames.get(key)
+            if image is None:
+                image = get_image(sheet, x, y, width, height, colorkey, scale)
+                self.add_image(key, image)
+            return image
+
+    def add_image(self, key, image):
+        # Store a frame made elsewhere, e.g. loaded from baked assets
+        with self.lock:
+            self.frames[key] = image
+            self.sources[image] = key
+            self.bytes_cached += surface_bytes(image)
+
+    def get_key(self, image):
+        # Key of a frame handed out by this cache, None for other surfaces
+        with self.lock:
+            return self.sources.get(image)
+
+    def flip_image(self, image, flip_x, flip_y):
+        # Flip a frame handed out by this cache, reusing the cached result
+        key = self.get_key(image)
+        if key is None:
+            return pg.transform.flip(image, flip_x, flip_y)
+        sheet, rect, colorkey, scale, flip = key
+        return self.get_image(sheet, *rect, colorkey, scale,
+                              flip[0] != flip_x, flip[1] != flip_y)
+
+    def reset_stats(self):
+        # Reset the counters but keep the cached frames
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.bytes_saved = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'frames': len(self.frames),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_cached': self.bytes_cached,
+                'bytes_saved': self.bytes_saved
+            }
+
+    def get_items(self):
+        # (key, frame) pairs of the cached frames, a copy which stays the same
+        # while frames are added
+        with self.lock:
+            return list(self.frames.items())
+
+    def clear(self):
+        with self.lock:
+            self.frames = {}
+            self.sources = {}
+            self.bytes_cached = 0
+            self.reset_stats()
+
+# Process-wide frame cache used by the sprite components
+FRAME_CACHE = FrameCache()
+
+# Function to get a shared, cached frame from a sprite sheet
+def get_frame(sheet, x, y, width, height, colorkey, scale, flip_x=False, flip_y=False):
+    return FRAME_CACHE.get_image(sheet, x, y, width, height, colorkey, scale, flip_x, flip_y)
+
+# Function to flip a cached frame, sharing the flipped surface as well
+def flip_frame(image, flip_x, flip_y):
+    return FRAME_CACHE.flip_image(image, flip_x, flip_y)
+
+# Function to get the number of bytes of pixel data held by a surface
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+# Class drawing a background image scaled by scale without keeping a scaled copy
+# of the whole image: strips of strip_width source columns are scaled when they
+# are first drawn and the max_strips most recently used ones are kept
+class ScaledBackground():
+    def __init__(self, image, scale, strip_width=128, max_strips=6):
+        self.image = image
+        self.scale = scale
+        self.strip_width = strip_width
+        self.max_strips = max_strips
+        self.strips = {}
+        self.source_width, self.source_height = image.get_size()
+        self.width = int(self.source_width * scale)
+        self.height = int(self.source_height * scale)
+        self.strip_num = (self.source_width + strip_width - 1) // strip_width
+        # strips of an image without transparent pixels are blitted without blending
+        self.strip_flags = 0
+        if (image.get_flags() & pg.SRCALPHA and
+                pg.mask.from_surface(image, 254).count() < self.source_width * self.source_height):
+            self.strip_flags = pg.SRCALPHA
+
+    def __getstate__(self):
+        # for gamestate: the strips are scaled again when drawn
+        state = self.__dict__.copy()
+        state['strips'] = {}
+        return state
+
+    def get_rect(self):
+        return pg.Rect(0, 0, self.width, self.height)
+
+    def get_strip_x(self, index):
+        # x position of a strip in the scaled image
+        if index >= self.strip_num:
+            return self.width
+        return int(index * self.strip_width * self.scale)
+
+    def get_source_x(self, x):
+        # source column drawn at column x of the scaled image, the same one
+        # pg.transform.scale() picks when scaling the whole image
+        return x * self.source_width // self.width
+
+    def make_strip(self, index):
+        # The columns of the whole scaled image from get_strip_x(index) to
+        # get_strip_x(index + 1). Scaling the strip's source columns on their
+        # own would pick other columns, as the ratio differs, so they are only
+        # scaled vertically, which picks the same rows, and each column is then
+        # copied from its source column.
+        left = self.get_strip_x(index)
+        right = self.get_strip_x(index + 1)
+        first = self.get_source_x(left)
+        last = self.get_source_x(right - 1)
+        source = self.image.subsurface((first, 0, last - first + 1, self.source_height))
+        columns = pg.transform.scale(source, (last - first + 1, self.height))
+        columns.set_colorkey(None)
+        strip = pg.Surface((right - left, self.height), self.strip_flags, columns)
+        strip.fill((0, 0, 0, 0))
+        # the maximum with the cleared strip copies alpha as it is, instead of blending
+        strip.blits([(columns, (x - left, 0), (self.get_source_x(x) - first, 0, 1, self.height),
+                      pg.BLEND_RGBA_MAX) for x in range(left, right)], False)
+        strip.set_colorkey(self.image.get_colorkey())
+        return strip
+
+    def get_strip(self, index):
+        strip = self.strips.pop(index, None)
+        if strip is None:
+            strip = self.make_strip(index)
+            if len(self.strips) >= self.max_strips:
+                # drop the least recently used strip
+                del self.strips[next(iter(self.strips))]
+        self.strips[index] = strip
+        return strip
+
+    def draw(self, surface, area, dest=(0, 0)):
+        # blit area, in scaled image coordinates, onto surface at dest
+        area = pg.Rect(area)
+        clipped = area.clip(self.get_rect())
+        dest_x = dest[0] + clipped.x - area.x
+        dest_y = dest[1] + clipped.y - area.y
+
+        index = min(int(clipped.left / (self.strip_width * self.scale)), self.strip_num - 1)
+        while index > 0 and self.get_strip_x(index) > clipped.left:
+            index -= 1
+        while self.get_strip_x(index + 1) <= clipped.left:
+            index += 1
+        while index < self.strip_num and self.get_strip_x(index) < clipped.right:
+            strip_x = self.get_strip_x(index)
+            left = max(clipped.left, strip_x)
+            right = min(clipped.right, self.get_strip_x(index + 1))
+            surface.blit(self.get_strip(index), (dest_x + left - clipped.left, dest_y),
+                         (left - strip_x, clipped.top, right - left, clipped.height))
+            index += 1
+
+    def get_bytes(self):
+        # pixel memory held by the scaled strips
+        return sum(surface_bytes(strip) for strip in self.strips.values())
+
+# Function to load all graphics from a specified directory, sheets baked into
+# cache (an assets.AssetCache) are loaded from there
+def load_all_gfx(directory, colorkey=(255, 0, 255), accept=('.png', '.jpg', '.bmp', '.gif'), cache=None):
     graphics = {}
     for pic in os.listdir(directory):
         name, ext = os.path.splitext(pic)
         if ext.lower() in accept:
+            img = cache.load_sheet(name) if cache is not None else None
+            if img is not None:
+                graphics[name] = img
+                continue
             img = pg.image.load(os.path.join(directory, pic))
             if img.get_alpha():
                 img = img.convert_alpha()
@@ -0,0 +1,221 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = 'm0rniac'
+
+# Steps many environments at once in worker processes, e.g. to evaluate a
+# controller on a batch of games. Actions, observations and results are
+# exchanged through arrays in shared memory, the pipes to the workers only
+# carry the commands:
+#
+#     from source import vector_environment
+#     envs = vector_environment.VectorEnvironment(64)
+#     observations = envs.reset(level_num=1)
+#     for i in range(1000):
+#         observations, rewards, terminated, truncated, info = envs.step(actions)
+#     print(envs.get_steps_per_second())
+#     envs.close()
+#
+# The arrays returned are views of the shared memory and are overwritten by the
+# next step or reset, copy them to keep them. Workers are forked where possible,
+# so they start with the graphics and player data already loaded by this process.
+
+import os
+import sys
+import time
+import traceback
+import multiprocessing as mp
+import numpy as np
+from . import environment
+from . import constants as c
+
+# Per environment fields of the shared arrays, with their dtype
+FIELDS = [
+    ('score', np.int64),
+    ('x', np.int64),
+    ('reward', np.float64),
+    ('action', np.int32),
+    ('level_num', np.int32),
+    ('terminated', np.bool_),
+    ('truncated', np.bool_),
+    ('death', np.bool_),
+    ('castle', np.bool_),
+    ('time_out', np.bool_),
+]
+
+INFO_FIELDS = ('death', 'castle', 'time_out', 'score', 'x')
+
+# Class laying out the arrays shared with the workers in one block of shared memory
+class SharedArrays():
+    def __init__(self, num_envs, options, buffer=None, context=mp):
+        dtype, shape = environment.get_observation_layout(**options)
+        layout = [('observation', dtype, shape)] + [(name, dtype, ()) for name, dtype in FIELDS]
+        offsets = []
+        size = 0
+        for name, dtype, shape in layout:
+            offsets.append(size)
+            nbytes = num_envs * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            # keep every array 8 byte aligned
+            size += (nbytes + 7) // 8 * 8
+        if buffer is None:
+            buffer = context.RawArray('B', max(size, 1))
+        self.buffer = buffer
+        for (name, dtype, shape), offset in zip(layout, offsets):
+            count = num_envs * int(np.prod(shape, dtype=np.int64))
+            array = np.frombuffer(buffer, dtype, count, offset).reshape((num_envs,) + shape)
+            setattr(self, name, array)
+
+# Function run by a worker process, stepping the environments start to stop
+def run_worker(connection, buffer, num_envs, start, stop, options, auto_reset):
+    arrays = SharedArrays(num_envs, options, buffer)
+    # a failure to build the environments is sent back as the reply to every
+    # command, so the parent raises it instead of finding the pipe closed
+    error = None
+    try:
+        envs = [environment.Environment(**options) for i in range(start, stop)]
+    except Exception:
+        envs = []
+        error = traceback.format_exc()
+    player_names = [c.PLAYER_MARIO] * len(envs)
+
+    def store(i, observation, result=None):
+        if observation is not None:
+            arrays.observation[i] = observation
+        if result is not None:
+            reward, terminated, truncated, info = result
+            arrays.reward[i] = reward
+            arrays.terminated[i] = terminated
+            arrays.truncated[i] = truncated
+            for name in INFO_FIELDS:
+                getattr(arrays, name)[i] = info[name]
+
+    while True:
+        command, args = connection.recv()
+        if command == 'close':
+            break
+        if error is not None:
+            connection.send(error)
+            continue
+        try:
+            if command == 'reset':
+                player_name = args
+                for j, env in enumerate(envs):
+                    i = start + j
+                    player_names[j] = player_name
+                    store(i, env.reset(int(arrays.level_num[i]), player_name),
+                          (0.0, False, False, dict.fromkeys(INFO_FIELDS, 0)))
+            elif command == 'step':
+                for j, env in enumerate(envs):
+                    i = start + j
+                    observation, *result = env.step(int(arrays.action[i]))
+                    if auto_reset and (result[1] or result[2]):
+                        # the results stay those of the last step of the episode
+                        observation = env.reset(int(arrays.level_num[i]), player_names[j])
+                    store(i, observation, result)
+            connection.send(None)
+        except Exception:
+            connection.send(traceback.format_exc())
+    connection.close()
+
+# Class stepping num_envs environments in worker processes
+class VectorEnvironment():
+    def __init__(self, num_envs, processes=None, auto_reset=True, **options):
+        # options are passed on to each environment.Environment
+        options.setdefault('observation', environment.OBSERVE_STATE)
+        self.num_envs = num_envs
+        processes = min(num_envs, processes or os.cpu_count() or 1)
+        # forked workers share the already loaded graphics instead of loading them again
+        methods = mp.get_all_start_methods()
+        context = mp.get_context('fork' if 'fork' in methods else None)
+        self.arrays = SharedArrays(num_envs, options, context=context)
+        self.connections = []
+        self.workers = []
+        for k in range(processes):
+            start = num_envs * k // processes
+            stop = num_envs * (k + 1) // processes
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=run_worker, daemon=True,
+                                     args=(worker_connection, self.arrays.buffer, num_envs,
+                                           start, stop, options, auto_reset))
+            worker.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.workers.append(worker)
+        self.step_count = 0
+        self.step_time = 0
+
+    def send(self, command, args=None):
+        for connection in self.connections:
+            connection.send((command, args))
+        errors = [connection.recv() for connection in self.connections]
+        for error in errors:
+            if error is not None:
+                raise RuntimeError('environment worker failed:\n' + error)
+
+    def reset(self, level_num=1, player_name=c.PLAYER_MARIO):
+        # Start new games, level_num is one level for all or one per environment,
+        # returns the observations
+        self.arrays.level_num[:] = level_num
+        self.send('reset', player_name)
+        return self.arrays.observation
+
+    def step(self, actions):
+        # Step every environment with its action bitmask, returns the observations,
+        # rewards, terminated and truncated flags and a dictionary of info arrays.
+        # With auto_reset a finished game is started again on its level, and its
+        # observation is the first of the new game.
+        start_time = time.perf_counter()
+        self.arrays.action[:] = actions
+        self.send('step')
+        self.step_time += time.perf_counter() - start_time
+        self.step_count += self.num_envs
+        arrays = self.arrays
+        info = {name: getattr(arrays, name) for name in INFO_FIELDS}
+        return arrays.observation, arrays.reward, arrays.terminated, arrays.truncated, info
+
+    def get_steps_per_second(self):
+        # Environment steps per second over all step() calls
+        return self.step_count / self.step_time if self.step_time else 0.0
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+        self.workers = []
+
+if __name__ == '__main__':
+    # Benchmark: python -m source.vector_environment [num_envs] [processes] [steps]
+    num_envs, processes, steps = (list(map(int, sys.argv[1:4])) + [0, 0, 0])[:3]
+    envs = VectorEnvironment(num_envs or 16, processes or None)
+    envs.reset()
+    actions = np.random.default_rng(0).integers(0, environment.ACTION_COUNT,
+                                                (steps or 1000, envs.num_envs))
+    for step_actions in actions:
+        envs.step(step_actions)
+    print('%d environments in %d processes: %.0f steps/s' %
+          (envs.num_envs, len(envs.workers), envs.get_steps_per_second()))
+    envs.close()
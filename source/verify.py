@@ -0,0 +1,133 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+__author__ = 'm0rniac'
+
+# Verifies the game info submitted replays claim: each replay in a directory
+# is played back without drawing, as fast as the game updates, in a pool of
+# worker processes, and its final score, coins and level are compared with the
+# game info saved in the replay. One JSON line is written per replay:
+#
+#     python -m source.verify submissions/ results.jsonl [processes]
+#
+# Workers are forked where possible, so they start with the graphics already
+# loaded, and each plays many replays.
+#
+# The game is played with the time steps saved in the replay, which anyone can
+# change: tiny steps would slow the level timers down and give a player more
+# ticks to act in. So only replays whose steps a game capped to 60 fps could
+# record are played (see constants.VERIFY_*), no longer than
+# constants.VERIFY_MAX_TICKS. Keyframes are never loaded, the game is played
+# from the start.
+
+import os
+import sys
+import json
+import time
+import traceback
+import multiprocessing as mp
+# headless first, the workers don't open a window
+from . import headless
+from . import main, replay
+from . import constants as c
+
+# Game info a replay claims which has to match the played game
+CHECKED = (c.SCORE, c.COIN_TOTAL, c.LEVEL_NUM)
+
+# Function to check the ticks of a replay are ones a real game records,
+# raises ValueError when they aren't
+def check_ticks(recorded):
+    if not 0 < len(recorded) <= c.VERIFY_MAX_TICKS:
+        raise ValueError('%d ticks, replays of 1 to %d are verified' %
+                         (len(recorded), c.VERIFY_MAX_TICKS))
+    # the first tick has no step
+    if len(recorded) > 1 and max(recorded.steps[1:]) > c.VERIFY_MAX_STEP:
+        raise ValueError('ticks %d ms apart, a game records at most %d ms' %
+                         (max(recorded.steps[1:]), c.VERIFY_MAX_STEP))
+    times = recorded.get_times()
+    window = min(c.VERIFY_WINDOW, len(times) - 1)
+    shortest = window * c.VERIFY_MIN_AVERAGE_STEP - c.VERIFY_SLACK
+    for tick in range(len(times) - window):
+        if times[tick + window] - times[tick] < shortest:
+            raise ValueError('%d ticks from tick %d in %d ms, faster than a game runs' %
+                             (window, tick, times[tick + window] - times[tick]))
+
+# Function to play back the replay at path, returns the result as a dictionary
+def verify_replay(path):
+    start = time.perf_counter()
+    result = {'path': path, 'ok': False}
+    try:
+        with open(path, 'rb') as f:
+            recorded, index = replay.read_replay(f, path)
+        if recorded.game_info is None:
+            raise ValueError('%s claims no game info' % path)
+        check_ticks(recorded)
+        game = main.create_game(playback=replay.Playback(recorded), render=False)
+        while not game.done:
+            replay.step(game)
+        played = game.get_game_info()
+        result['ticks'] = len(recorded)
+        result['claimed'] = {key: recorded.game_info.get(key) for key in CHECKED}
+        result['played'] = {key: played.get(key) for key in CHECKED}
+        result['mismatches'] = [key for key in CHECKED
+                                if result['claimed'][key] != result['played'][key]]
+        result['ok'] = not result['mismatches']
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+# Function to verify the replays in directory, writing the results to output
+# as JSON lines in the order the replays are done, returns the results
+def verify_directory(directory, output, processes=None, chunksize=4):
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.endswith('.rpl'))
+    methods = mp.get_all_start_methods()
+    context = mp.get_context('fork' if 'fork' in methods else None)
+    results = []
+    pool = context.Pool(processes)
+    try:
+        with open(output, 'w') as f:
+            for result in pool.imap_unordered(verify_replay, paths, chunksize):
+                f.write(json.dumps(result) + '\n')
+                results.append(result)
+    finally:
+        # workers exit when closed, SDL catches the SIGTERM of pool.terminate()
+        pool.close()
+        pool.join()
+    return results
+
+if __name__ == '__main__':
+    directory, output = sys.argv[1:3]
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    start = time.perf_counter()
+    results = verify_directory(directory, output, processes)
+    elapsed = time.perf_counter() - start
+    verified = [result for result in results if result['ok']]
+    print('%d replays in %.1f s (%.1f/s): %d verified, %d failed' %
+          (len(results), elapsed, len(results) / elapsed if elapsed else 0,
+           len(verified), len(results) - len(verified)))
+    if verified:
+        print('top verified score:', max(result['played'][c.SCORE] for result in verified))
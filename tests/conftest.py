@@ -0,0 +1,92 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+__author__ = 'm0rniac'
+
+# Shared setup of the tests: the game runs headless under SDL's dummy video
+# driver, from the repository root where it finds its graphics and maps.
+#
+#     python -m pytest -q
+
+import os
+import sys
+import random
+import hashlib
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ['MARIO_HEADLESS'] = '1'
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import pygame as pg
+from source import headless
+
+# Function to get a digest of the state of a level: the sprites of its groups,
+# the game info, the viewport and the player
+def get_level_state(level):
+    groups = []
+    for name, group in sorted(level.__dict__.items()):
+        if isinstance(group, pg.sprite.AbstractGroup):
+            groups.append((name, [(type(sprite).__name__, tuple(sprite.rect),
+                                   getattr(sprite, 'state', None),
+                                   getattr(sprite, 'frame_index', None)) for sprite in group]))
+    player = level.player
+    state = (groups, sorted(level.game_info.items()), tuple(level.viewport),
+             level.overhead_info.time, player.state, player.big, player.fire,
+             tuple(player.rect), player.x_vel, player.y_vel)
+    return hashlib.md5(repr(state).encode()).hexdigest()
+
+# Function to get a digest of the pixels of surface
+def get_pixels(surface):
+    return hashlib.md5(pg.image.tobytes(surface, 'RGB')).hexdigest()
+
+# Function to make count random key states of a run to the right, the same for a seed
+def get_actions(seed, count):
+    generator = random.Random(seed)
+    keys = headless.keys
+    choices = [keys('right'), keys('right', 'jump'), keys('right', 'action'),
+               keys('right', 'action', 'jump'), keys('left'), keys(), keys('down')]
+    actions = []
+    for i in range(count):
+        if i % 10 == 0:
+            current = generator.choice(choices)
+        actions.append(current)
+    return actions
+
+@pytest.fixture
+def level_state():
+    return get_level_state
+
+@pytest.fixture
+def pixels():
+    return get_pixels
+
+@pytest.fixture
+def actions():
+    return get_actions
@@ -0,0 +1,81 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+__author__ = 'm0rniac'
+
+# Walking and falling enemies moved in a batch by the EnemyEngine end up
+# exactly where the enemies' own updates would put them
+
+import random
+import pytest
+from source import headless
+from source import constants as c
+from source.components import enemy
+
+pytest.importorskip('numpy')
+
+# Function to play a level crowded with goombas and koopas, batching the
+# enemies when batch, returns the level state and the enemies after each tick
+# and the most enemies batched in a tick
+def play(level_num, batch, level_state, pixels, monkeypatch):
+    monkeypatch.setattr(c, 'BATCH_ENEMIES', batch)
+    sim = headless.Simulation(level_num, render=True)
+    level = sim.level
+    if batch:
+        # batch however few enemies are awake
+        level.enemy_engine.min_batch = 1
+    generator = random.Random(level_num)
+    for i in range(40):
+        x = generator.randint(200, 3000)
+        y = generator.choice([c.GROUND_HEIGHT, 400, 300, 200])
+        cls = generator.choice([enemy.Goomba, enemy.Koopa])
+        level.enemy_group.add(cls(x, y, generator.choice([c.LEFT, c.RIGHT]),
+                                  generator.randint(0, 1), generator.random() < 0.2,
+                                  x - 100, x + 100))
+    trace = []
+    most_batched = 0
+    for tick in range(600):
+        keys = ['right'] if tick % 3 else []
+        if tick % 50 < 10:
+            keys.append('jump')
+        done = sim.step(headless.keys(*keys))
+        if batch:
+            most_batched = max(most_batched, level.enemy_engine.batched_count)
+        enemies = sorted((sprite.rect.x, sprite.rect.y, sprite.state, sprite.frame_index,
+                          sprite.direction, sprite.x_vel, sprite.y_vel)
+                         for group in (level.enemy_group, level.shell_group, level.dying_group)
+                         for sprite in group)
+        trace.append((level_state(level), pixels(sim.surface), enemies))
+        if done:
+            break
+    return trace, most_batched
+
+@pytest.mark.parametrize('level_num', [1, 2, 3])
+def test_batched_enemies_move_the_same(level_num, level_state, pixels, monkeypatch):
+    expected, _ = play(level_num, False, level_state, pixels, monkeypatch)
+    trace, most_batched = play(level_num, True, level_state, pixels, monkeypatch)
+    assert most_batched > 1
+    assert trace == expected
@@ -0,0 +1,90 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+__author__ = 'm0rniac'
+
+# Seeking a replay file through its keyframes gives the game linear playback
+# has at the same tick, rewind history included
+
+import random
+import pytest
+import pygame as pg
+from array import array
+from source import headless, tools, replay, main
+from source import constants as c
+
+# Function to make a replay of ticks which starts a game from the menu, runs
+# right and jumps, and holds the rewind key now and then, on a clock whose
+# steps jitter like a real one's
+def make_replay(ticks):
+    generator = random.Random(0)
+    masks = bytearray()
+    steps = array('I', [0])
+    for tick in range(ticks):
+        if 60 <= tick < 64:
+            keys = tools.KeyState([pg.K_RETURN])
+        elif tick % 500 >= 460:
+            keys = headless.keys('rewind')
+        elif tick % 70 < 20:
+            keys = headless.keys('right', 'jump')
+        else:
+            keys = headless.keys('right')
+        masks.append(replay.get_mask(keys))
+        steps.append(generator.choice([15, 16, 17, 17, 33]))
+    return replay.Replay(masks, steps[:ticks], 1000, rewind_memory=c.REWIND_MEMORY)
+
+# Function to get what a game shows after a tick
+def get_tick_state(game, level_state, pixels):
+    state = [game.state_name, sorted(game.get_game_info().items()), game.current_time,
+             pixels(game.screen)]
+    if game.state_name == c.LEVEL:
+        state.append(level_state(game.state))
+    return state
+
+def test_seek_plays_like_linear_playback(tmp_path, level_state, pixels):
+    path = str(tmp_path / 'session.rpl')
+    recorded = make_replay(1500)
+    # the rewinding from tick 460 goes back past the keyframe at 450
+    replay.add_keyframes(recorded, 150)
+    recorded.save(path)
+    assert len(recorded.keyframes) == 10
+    assert recorded.get_last_rewind() > 1000
+
+    game = main.create_game(playback=replay.Playback(replay.load_replay(path)))
+    expected = []
+    while not game.done:
+        game.step()
+        expected.append(get_tick_state(game, level_state, pixels))
+
+    # forwards, backwards and right at keyframes, rewinding ticks included
+    seeker = replay.Seeker(path)
+    try:
+        for tick in (480, 499, 149, 150, 975, 1000, 1399, 620, 0):
+            game = seeker.seek(tick)
+            replay.step(game)
+            assert get_tick_state(game, level_state, pixels) == expected[tick], tick
+    finally:
+        seeker.close()
@@ -0,0 +1,63 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+__author__ = 'm0rniac'
+
+# A level restored from a snapshot plays on exactly as it did when the
+# snapshot was taken, whatever was played in between
+
+import pytest
+from source import headless
+
+# Function to play actions in sim, returns the state and pixels after each tick
+def play(sim, actions, level_state, pixels):
+    trace = []
+    for keys in actions:
+        done = sim.step(keys, render=True)
+        trace.append((level_state(sim.level), pixels(sim.surface)))
+        if done:
+            break
+    return trace
+
+# level 4's fire sticks can't be updated with the other enemies yet
+@pytest.mark.parametrize('level_num', [1, 2, 3])
+def test_restore_plays_the_same(level_num, level_state, pixels, actions):
+    sim = headless.Simulation(level_num, render=True)
+    play(sim, actions(level_num, 300), level_state, pixels)
+    state = sim.snapshot()
+    after = actions(level_num + 10, 400)
+    expected = play(sim, after, level_state, pixels)
+    for seed in (20, 30):
+        sim.restore(state)
+        play(sim, actions(level_num + seed, 200), level_state, pixels)
+        sim.restore(state)
+        assert play(sim, after, level_state, pixels) == expected
+
+def test_restore_is_checked():
+    sim = headless.Simulation(1)
+    other = headless.Simulation(1)
+    with pytest.raises(ValueError):
+        sim.restore(other.snapshot())
@@ -0,0 +1,58 @@
+"""
+MIT License
+
+Copyright (c) [2023] [m0rniac]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+__author__ = 'm0rniac'
+
+# A level streaming its map entities around the viewport plays and draws the
+# same as one building them all up front
+
+import pytest
+from source import headless
+from source import constants as c
+
+# Function to play a level for ticks, running right and jumping for jump of
+# every period ticks and starting again after a death, returns what the
+# player sees after each tick
+def play(level_num, ticks, period, jump, pixels):
+    sim = headless.Simulation(level_num, render=True)
+    assert (sim.level.streamer is not None) == c.STREAMING
+    run, run_jump = headless.keys('right', 'action'), headless.keys('right', 'action', 'jump')
+    trace = []
+    for tick in range(ticks):
+        if sim.step(run_jump if tick % period < jump else run):
+            sim.restart()
+        player = sim.level.player
+        trace.append((pixels(sim.surface), tuple(player.rect), player.state,
+                      sorted(sim.level.game_info.items()), tuple(sim.level.viewport)))
+    return trace
+
+# jumps which get far into each level
+@pytest.mark.parametrize('level_num, period, jump', [(1, 30, 15), (2, 50, 20), (3, 40, 12)])
+def test_streaming_plays_the_same(level_num, period, jump, pixels, monkeypatch):
+    monkeypatch.setattr(c, 'STREAMING', False)
+    expected = play(level_num, 1000, period, jump, pixels)
+    monkeypatch.setattr(c, 'STREAMING', True)
+    assert play(level_num, 1000, period, jump, pixels) == expected